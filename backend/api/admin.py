@@ -70,6 +70,7 @@ class RecipesAdmin(admin.ModelAdmin):
     а также управлять ингредиентами рецепта.
     """
     list_display = ["id", "name", "author", "favorites"]
+    readonly_fields = ["favorites_count", "shopping_cart_count"]
     search_fields = ["name", "author__username"]
     list_filter = ["tags", "author", "name"]
     inlines = (IngredientsInLine,)
@@ -78,9 +79,9 @@ class RecipesAdmin(admin.ModelAdmin):
         """
         Метод для отображения количества добавлений рецепта в избранное.
 
-        Возвращает количество объектов Favorites, связанных с рецептом.
+        Значение берётся из счётчика favorites_count.
         """
-        return Favorites.objects.filter(recipe=obj).count()
+        return obj.favorites_count
 
 
 class FavoriteAdmin(admin.ModelAdmin):
@@ -0,0 +1,172 @@
+"""
+Массовое добавление и удаление избранного, корзины и подписок.
+
+Список id проверяется одним запросом, строки вставляются одним
+INSERT … ON CONFLICT DO NOTHING RETURNING или удаляются одним
+DELETE … RETURNING. Счётчики меняются только для строк, которые
+вернула база, поэтому параллельные запросы не сбивают их. Сигналы
+моделей при этом не срабатывают, так что счётчики, лента и версии
+кэша обновляются здесь явно, по одному разу на весь список. На СУБД
+без RETURNING строки обрабатываются по одной через ORM, а счётчики
+обновляют сигналы.
+"""
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+
+from api.cache import invalidate_user_state
+from recipes import counters, feed
+from recipes.models import Favorites, Recipe, ShoppingCart
+from users.models import Subscriptions, User
+
+Relation = namedtuple("Relation", "model target foreign_key")
+
+FAVORITES = Relation(Favorites, Recipe, "recipe_id")
+SHOPPING_CART = Relation(ShoppingCart, Recipe, "recipe_id")
+SUBSCRIPTIONS = Relation(Subscriptions, User, "author_id")
+
+CREATED = "created"
+DELETED = "deleted"
+EXISTS = "exists"
+MISSING = "missing"
+NOT_FOUND = "not_found"
+SELF = "self"
+
+ADD_SQL = """
+INSERT INTO {link} ({user}, {target}) VALUES {values}
+ON CONFLICT DO NOTHING
+RETURNING {target}
+"""
+
+REMOVE_SQL = """
+DELETE FROM {link} WHERE {user} = %s AND {target} IN ({targets})
+RETURNING {target}
+"""
+
+
+def unique(ids):
+    return list(dict.fromkeys(ids))
+
+
+def supports_returning():
+    if connection.vendor == "sqlite":
+        return connection.Database.sqlite_version_info >= (3, 35)
+    return connection.vendor == "postgresql"
+
+
+def sql_names(relation):
+    """Имена таблицы и колонок связи для SQL-шаблонов."""
+    quote = connection.ops.quote_name
+    meta = relation.model._meta
+    return {
+        "link": quote(meta.db_table),
+        "user": quote(meta.get_field("user").column),
+        "target": quote(meta.get_field(relation.foreign_key).column),
+    }
+
+
+def execute(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def after_change(relation, user, pks, sign):
+    """Счётчики, лента и кэш для строк, которые изменила база."""
+    counters.adjust(
+        relation.model,
+        [
+            relation.model(user=user, **{relation.foreign_key: pk})
+            for pk in pks
+        ],
+        sign,
+    )
+    if relation is SUBSCRIPTIONS:
+        feed.rebuild([user.id])
+    invalidate_user_state([user.id])
+
+
+def insert(relation, user, pks):
+    """Вставляет связи, возвращает id, для которых строка создана."""
+    if not supports_returning():
+        return {
+            pk for pk in pks
+            if relation.model.objects.get_or_create(
+                user=user, **{relation.foreign_key: pk}
+            )[1]
+        }
+    created = execute(
+        ADD_SQL.format(
+            values=", ".join(["(%s, %s)"] * len(pks)),
+            **sql_names(relation),
+        ),
+        [value for pk in pks for value in (user.id, pk)],
+    )
+    if created:
+        after_change(relation, user, created, 1)
+    return created
+
+
+def delete(relation, user, pks):
+    """Удаляет связи, возвращает id, для которых строка удалена."""
+    if not supports_returning():
+        return {
+            pk for pk in pks
+            if relation.model.objects.filter(
+                user=user, **{relation.foreign_key: pk}
+            ).delete()[0]
+        }
+    deleted = execute(
+        REMOVE_SQL.format(
+            targets=", ".join(["%s"] * len(pks)), **sql_names(relation)
+        ),
+        [user.id, *pks],
+    )
+    if deleted:
+        after_change(relation, user, deleted, -1)
+    return deleted
+
+
+def add(relation, user, ids):
+    """Добавляет связи, возвращает статус для каждого id."""
+    ids = unique(ids)
+    linked = dict(
+        relation.target.objects.filter(pk__in=ids)
+        .annotate(
+            linked=Exists(
+                relation.model.objects.filter(
+                    user=user, **{relation.foreign_key: OuterRef("pk")}
+                )
+            )
+        )
+        .values_list("pk", "linked")
+    )
+    results = {}
+    for pk in ids:
+        if pk not in linked:
+            results[pk] = NOT_FOUND
+        elif relation is SUBSCRIPTIONS and pk == user.id:
+            results[pk] = SELF
+        else:
+            results[pk] = EXISTS if linked[pk] else CREATED
+    candidates = [pk for pk, result in results.items() if result == CREATED]
+    if candidates:
+        with transaction.atomic():
+            created = insert(relation, user, candidates)
+        # Строку могли вставить параллельно после проверки.
+        for pk in candidates:
+            if pk not in created:
+                results[pk] = EXISTS
+    return [{"id": pk, "status": result} for pk, result in results.items()]
+
+
+def remove(relation, user, ids):
+    """Удаляет связи, возвращает статус для каждого id."""
+    ids = unique(ids)
+    with transaction.atomic():
+        removed = delete(relation, user, ids)
+    return [
+        {"id": pk, "status": DELETED if pk in removed else MISSING}
+        for pk in ids
+    ]
@@ -0,0 +1,142 @@
+"""Кэш ответов API и их валидаторы для условных запросов."""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from recipes.snapshots import bump_versions, get_versions, version_time
+
+RECIPE_LIST_VERSION = "recipes:list-version"
+TAGS_VERSION = "tags:version"
+
+
+def recipe_version_key(recipe_id):
+    return f"recipes:version:{recipe_id}"
+
+
+def user_version_key(user_id):
+    """Версия избранного, корзины и подписок пользователя."""
+    return f"users:state-version:{user_id}"
+
+
+def invalidate_user_state(user_ids):
+    bump_versions([user_version_key(user_id) for user_id in user_ids])
+
+
+def invalidate_recipes(recipe_ids=()):
+    """Сбрасывает кэш списков и деталей указанных рецептов."""
+    bump_versions(
+        [RECIPE_LIST_VERSION]
+        + [recipe_version_key(recipe_id) for recipe_id in recipe_ids]
+    )
+
+
+def normalized_query(request):
+    """Параметры запроса в порядке сортировки."""
+    return urlencode(
+        sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+    )
+
+
+def response_cache_key(request, version_keys):
+    """
+    Ключ кэша: версии данных плюс нормализованный адрес запроса.
+
+    Параметры запроса сортируются, поэтому порядок параметров в
+    адресе не порождает разные записи кэша.
+    """
+    versions = get_versions(version_keys)
+    signature = "|".join(
+        [request.get_host(), request.path, normalized_query(request)]
+        + [versions[key] for key in version_keys]
+    )
+    return "recipes:response:" + hashlib.md5(signature.encode()).hexdigest()
+
+
+def cached_anonymous_response(request, version_keys, render):
+    """
+    Отдаёт ответ анонимному пользователю из кэша.
+
+    Ответы анонимам не зависят от пользователя, поэтому их можно
+    разделять между всеми запросами с одинаковым адресом. Ответы
+    авторизованным пользователям не кэшируются.
+    """
+    if request.user.is_authenticated:
+        return render()
+    key = response_cache_key(request, version_keys)
+    data = cache.get(key)
+    if data is not None:
+        return Response(data)
+    response = render()
+    if response.status_code == 200:
+        cache.set(key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+    return response
+
+
+def conditional_response(request, version_keys, render, max_age=None,
+                         per_user=True):
+    """
+    Ответ с ETag и Last-Modified, посчитанными по версиям данных.
+
+    Валидаторы строятся только из токенов версий в кэше, без запросов
+    к базе и без сериализации: если клиент прислал совпадающий
+    If-None-Match или If-Modified-Since, сразу отдаётся 304. Ответы
+    авторизованным пользователям с per_user зависят ещё и от версии их
+    избранного, корзины и подписок. С max_age ответ можно кэшировать
+    публично, иначе кэш обязан перепроверять его при каждом запросе.
+    """
+    keys = list(version_keys)
+    per_user = per_user and request.user.is_authenticated
+    if per_user:
+        keys.append(user_version_key(request.user.pk))
+    versions = get_versions(keys)
+    signature = "|".join(
+        [
+            request.get_host(),
+            request.path,
+            normalized_query(request),
+            request.accepted_media_type or "",
+        ]
+        + [versions[key] for key in keys]
+    )
+    etag = '"%s"' % hashlib.md5(signature.encode()).hexdigest()
+    times = [version_time(versions[key]) for key in keys]
+    last_modified = (
+        int(max(times)) if times and None not in times else None
+    )
+    # Last-Modified точен до секунды: следующее изменение в ту же
+    # секунду получило бы ту же дату, и клиент с If-Modified-Since
+    # увидел бы ложный 304. Пока секунда изменения не прошла, дата не
+    # отдаётся и не проверяется, остаётся ETag.
+    if last_modified is not None and time.time() < last_modified + 1:
+        last_modified = None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = render()
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        if per_user:
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ("Authorization",))
+        elif max_age is not None:
+            patch_cache_control(response, public=True, max_age=max_age)
+        else:
+            patch_cache_control(response, no_cache=True)
+    return response
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """
+    Версии кэша ответов и снимков должны быть общими для процессов.
+
+    С кэшем в памяти процесса инвалидация из воркера или команды
+    manage.py не доходит до процессов gunicorn.
+    """
+    if settings.CACHES["default"]["BACKEND"] in LOCAL_CACHES:
+        return [
+            Error(
+                "Кэш по умолчанию локален для процесса.",
+                hint="Задайте CACHE_BACKEND и CACHE_LOCATION общего кэша, "
+                     "например memcached.",
+                id="api.E001",
+            )
+        ]
+    return []
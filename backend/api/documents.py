@@ -0,0 +1,62 @@
+"""Кэш общих, не зависящих от пользователя документов рецептов."""
+from django.conf import settings
+from django.core.cache import cache
+
+from api.cache import recipe_version_key
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe
+from recipes.snapshots import get_versions
+
+
+def recipe_documents(request, recipe_ids):
+    """
+    Документы рецептов в порядке recipe_ids.
+
+    Документ сериализуется один раз и хранится в кэше под версией
+    рецепта, поэтому любое изменение рецепта, его тегов, ингредиентов
+    или автора выдаёт новый ключ. Отсутствующие в кэше документы
+    строятся одним запросом. Несуществующие рецепты пропускаются.
+    """
+    versions = get_versions(
+        [recipe_version_key(recipe_id) for recipe_id in recipe_ids]
+    )
+    keys = {
+        recipe_id: (
+            f"recipes:document:{recipe_id}:"
+            f"{versions[recipe_version_key(recipe_id)]}:{request.get_host()}"
+        )
+        for recipe_id in recipe_ids
+    }
+    cached = cache.get_many(list(keys.values()))
+    documents = {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items()
+        if key in cached
+    }
+    missing = [
+        recipe_id for recipe_id in recipe_ids if recipe_id not in documents
+    ]
+    if missing:
+        recipes = (
+            Recipe.objects.filter(id__in=missing)
+            .select_related("author")
+            .prefetch_related("recipe_ingredients", "tags")
+        )
+        built = {
+            document["id"]: document
+            for document in RecipeSerializer(
+                recipes,
+                many=True,
+                context={"request": request, "subscribed_ids": set()},
+            ).data
+        }
+        cache.set_many(
+            {keys[recipe_id]: built[recipe_id] for recipe_id in built},
+            settings.RECIPE_CACHE_TIMEOUT,
+        )
+        documents.update(built)
+    return [
+        documents[recipe_id]
+        for recipe_id in recipe_ids
+        if recipe_id in documents
+    ]
@@ -1,7 +1,10 @@
+from django.conf import settings
+from django.db.models import Case, IntegerField, Q, When
 from django_filters import rest_framework as filter
 from django_filters import CharFilter, FilterSet
 
 from recipes.models import Recipe, Tag, Ingredient
+from recipes.search import search_recipes
 from users.models import User
 
 
@@ -22,10 +25,13 @@ class RecipeFilter(filter.FilterSet):
     is_in_shopping_cart = filter.BooleanFilter(
         method="get_is_in_shopping_cart"
     )
+    search = filter.CharFilter(method="get_search")
 
     class Meta:
         model = Recipe
-        fields = ("tags", "author", "is_favorited", "is_in_shopping_cart")
+        fields = (
+            "tags", "author", "is_favorited", "is_in_shopping_cart", "search"
+        )
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated:
@@ -41,10 +47,37 @@ class RecipeFilter(filter.FilterSet):
             return queryset.exclude(shoppinga_cart__user=self.request.user)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск, результаты по убыванию релевантности."""
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
+
 
 class IngredientFilter(FilterSet):
-    name = CharFilter(lookup_expr="startswith")
+    """
+    Автодополнение ингредиентов по названию.
+
+    Поиск регистронезависимый: сначала идут совпадения по началу
+    названия, затем (если включён триграммный поиск) совпадения по
+    подстроке. Количество результатов ограничено.
+    """
+    name = CharFilter(method="filter_name")
 
     class Meta:
         model = Ingredient
         fields = ("name",)
+
+    def filter_name(self, queryset, name, value):
+        prefix = Q(name__istartswith=value)
+        if settings.INGREDIENT_TRIGRAM_SEARCH:
+            queryset = queryset.filter(name__icontains=value).annotate(
+                rank=Case(
+                    When(prefix, then=0),
+                    default=1,
+                    output_field=IntegerField(),
+                )
+            ).order_by("rank", "name")
+        else:
+            queryset = queryset.filter(prefix)
+        return queryset[:settings.INGREDIENT_AUTOCOMPLETE_LIMIT]
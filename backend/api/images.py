@@ -0,0 +1,100 @@
+"""
+Уменьшенные копии картинок рецептов.
+
+Копии генерирует фоновый воркер (задача image_variants) и сохраняет
+рядом с оригиналом под предсказуемыми именами:
+<имя оригинала без расширения>.<размер>.<формат>. Готовность копий
+хранится в Recipe.image_variants_ready; пока копий нет, вместо них
+отдаётся адрес оригинала.
+"""
+import hashlib
+import io
+import json
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from api.cache import invalidate_recipes
+from recipes.models import Recipe
+
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def variant_name(name, size, image_format):
+    stem = os.path.splitext(name)[0]
+    return f"{stem}.{size}.{EXTENSIONS[image_format]}"
+
+
+def variant_names(name):
+    return [
+        variant_name(name, size, image_format)
+        for size in settings.IMAGE_VARIANT_SIZES
+        for image_format in settings.IMAGE_VARIANT_FORMATS
+    ]
+
+
+def job_key(name):
+    return hashlib.sha256(f"image-variants:{name}".encode()).hexdigest()
+
+
+def variants_ready(name):
+    """Копии пишутся по порядку, поэтому достаточно проверить последнюю."""
+    return default_storage.exists(variant_names(name)[-1])
+
+
+def variant_urls(image, ready, request=None):
+    """Адреса копий картинки по размерам и форматам."""
+    if not image:
+        return None
+    urls = {}
+    for size in settings.IMAGE_VARIANT_SIZES:
+        urls[size] = {}
+        for image_format in settings.IMAGE_VARIANT_FORMATS:
+            url = (
+                default_storage.url(
+                    variant_name(image.name, size, image_format)
+                )
+                if ready else image.url
+            )
+            urls[size][image_format] = (
+                request.build_absolute_uri(url) if request else url
+            )
+    return urls
+
+
+def render_variants(payload):
+    """
+    Обработчик фоновой задачи: генерирует уменьшенные копии.
+
+    Возвращает список созданных файлов, который сохраняется как
+    результат задачи. Рецепты с этой картинкой помечаются готовыми, а
+    их кэш сбрасывается (кэш общий для воркера и веб-процессов).
+    """
+    name = payload["name"]
+    with default_storage.open(name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    for size, pixels in settings.IMAGE_VARIANT_SIZES.items():
+        resized = original.copy()
+        resized.thumbnail((pixels, pixels))
+        for image_format in settings.IMAGE_VARIANT_FORMATS:
+            target = variant_name(name, size, image_format)
+            if default_storage.exists(target):
+                continue
+            image = resized
+            if image_format == "jpeg" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, image_format.upper(), quality=80)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+    recipe_ids = list(
+        Recipe.objects.filter(image=name).values_list("id", flat=True)
+    )
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        image_variants_ready=True
+    )
+    invalidate_recipes(recipe_ids)
+    return "variants.json", json.dumps(variant_names(name)).encode()
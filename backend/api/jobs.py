@@ -0,0 +1,130 @@
+"""
+Очередь фоновых задач на основе таблицы Job.
+
+Воркер берёт задачу в аренду на JOB_LEASE_TIMEOUT секунд: если он
+завершился, не дописав результат (нехватка памяти, перезапуск), задача
+по истечении аренды снова попадает в очередь. Выполненные задачи и их
+файлы удаляются через JOB_RESULT_TTL секунд.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from api.models import Job
+
+HANDLERS = {
+    "shopping_list_pdf": "api.shopping_list.render_pdf",
+    "image_variants": "api.images.render_variants",
+    "feed_fan_out": "recipes.feed.run_fan_out",
+}
+
+
+def lease_expired():
+    """Условие для задач, аренда которых истекла."""
+    return Q(
+        status=Job.RUNNING,
+        updated__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_LEASE_TIMEOUT
+        ),
+    )
+
+
+def enqueue(kind, key, payload):
+    """
+    Ставит задачу в очередь, если результата с таким ключом ещё нет.
+
+    Возвращает существующую задачу, если она уже выполнена или
+    выполняется. Задачи, завершившиеся ошибкой или брошенные воркером
+    (истекла аренда), ставятся заново.
+    """
+    job, created = Job.objects.get_or_create(
+        key=key, defaults={"kind": kind, "payload": payload}
+    )
+    if created or job.status in (Job.PENDING, Job.DONE):
+        return job
+    requeued = Job.objects.filter(
+        Q(status=Job.FAILED) | lease_expired(), pk=job.pk
+    ).update(status=Job.PENDING, error="", updated=timezone.now())
+    if requeued:
+        job.status = Job.PENDING
+    return job
+
+
+def claim_next():
+    """
+    Забирает из очереди самую старую ожидающую задачу или задачу с
+    истекшей арендой.
+
+    На PostgreSQL строки блокируются с SKIP LOCKED, поэтому
+    несколько воркеров не мешают друг другу; условное обновление
+    статуса защищает от двойного выполнения и на других СУБД.
+    """
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status=Job.PENDING) | lease_expired())
+            .order_by("created")
+            .first()
+        )
+        if job is None:
+            return None
+        now = timezone.now()
+        claimed = Job.objects.filter(
+            pk=job.pk, status=job.status, updated=job.updated
+        ).update(status=Job.RUNNING, updated=now)
+    if not claimed:
+        return None
+    job.status = Job.RUNNING
+    job.updated = now
+    return job
+
+
+def run(job):
+    """
+    Выполняет задачу и сохраняет результат.
+
+    Обработчик возвращает имя и содержимое файла результата или None,
+    если задача ничего не сохраняет.
+    """
+    try:
+        handler = import_string(HANDLERS[job.kind])
+        result = handler(job.payload)
+        if result is not None:
+            name, content = result
+            job.result.save(
+                f"{job.key}/{name}", ContentFile(content), save=False
+            )
+    except Exception as error:
+        job.status = Job.FAILED
+        job.error = repr(error)
+    else:
+        job.status = Job.DONE
+    job.save(update_fields=("status", "result", "error", "updated"))
+    return job
+
+
+def run_next():
+    """Выполняет одну задачу из очереди, если она есть."""
+    job = claim_next()
+    if job is not None:
+        run(job)
+    return job
+
+
+def expire():
+    """Удаляет завершённые задачи старше JOB_RESULT_TTL вместе с файлами."""
+    expired = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        updated__lt=timezone.now() - timedelta(
+            seconds=settings.JOB_RESULT_TTL
+        ),
+    )
+    for job in expired.only("pk", "result"):
+        if job.result:
+            job.result.delete(save=False)
+    return expired.delete()[0]
@@ -0,0 +1,61 @@
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from api.jobs import expire, run_next
+
+
+class Command(BaseCommand):
+    help = "Запускает пул воркеров, выполняющих фоновые задачи из очереди."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Количество процессов-воркеров.",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Пауза в секундах, если очередь пуста.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Выполнить все задачи из очереди и завершиться.",
+        )
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            while run_next() is not None:
+                pass
+            expire()
+            return
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=self.work, args=(options["poll_interval"],))
+            for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Запущено воркеров: {len(processes)}")
+        for process in processes:
+            process.join()
+
+    @staticmethod
+    def work(poll_interval):
+        expired = 0
+        while True:
+            close_old_connections()
+            if run_next() is not None:
+                continue
+            if time.monotonic() - expired >= settings.JOB_EXPIRE_INTERVAL:
+                expire()
+                expired = time.monotonic()
+            time.sleep(poll_interval)
@@ -0,0 +1,72 @@
+from django.db import models
+
+
+class Job(models.Model):
+    """
+    Фоновая задача в очереди, хранящейся в базе данных.
+
+    Ключ задачи однозначно определяет её результат, поэтому
+    выполненная задача служит кэшем: повторный запрос с тем же ключом
+    получает готовый файл без повторного выполнения.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Выполняется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    kind = models.CharField(
+        max_length=50,
+        verbose_name="Тип задачи",
+    )
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Ключ результата",
+    )
+    payload = models.JSONField(
+        default=dict,
+        verbose_name="Входные данные",
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name="Статус",
+    )
+    result = models.FileField(
+        upload_to="jobs/",
+        blank=True,
+        verbose_name="Результат",
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name="Текст ошибки",
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата создания",
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Дата изменения",
+    )
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        ordering = ("created",)
+        indexes = (
+            models.Index(
+                fields=("status", "created"), name="job_status_created_idx"
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.kind} {self.key} ({self.status})"
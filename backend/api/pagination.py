@@ -1,5 +1,19 @@
+import base64
+import hashlib
+import json
+
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
@@ -9,3 +23,212 @@ class CustomPageNumberPagination(PageNumberPagination):
     """
     page_size = settings.CUSTOM_PAGE_SIZE
     page_size_query_param = "limit"
+
+
+def estimated_count(queryset):
+    """
+    Оценка числа строк таблицы от планировщика PostgreSQL.
+
+    Возвращает None для других СУБД и для небольших или ещё не
+    проанализированных таблиц, где оценка неточна.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < settings.PAGINATION_ESTIMATE_MIN_ROWS:
+        return None
+    return int(row[0])
+
+
+class LookaheadPage(Page):
+    """Страница, наличие следующей страницы у которой известно заранее."""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self.next_exists = has_next
+
+    def has_next(self):
+        return self.next_exists
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator с кэшированным числом записей.
+
+    Число записей кэшируется по SQL-запросу с параметрами, то есть
+    отдельно для каждого набора фильтров, на PAGINATION_COUNT_TIMEOUT
+    секунд. Для списка без фильтров берётся оценка планировщика.
+
+    Такое число может отставать от таблицы, поэтому оно только
+    возвращается клиентом в count. Существование страницы и следующей
+    за ней проверяются по самим строкам: выбирается на одну строку
+    больше размера страницы.
+    """
+
+    def validate_number(self, number):
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        return LookaheadPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        try:
+            sql = repr(query.sql_with_params())
+        except EmptyResultSet:
+            return 0
+        key = "pagination:count:" + hashlib.md5(sql.encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            if not query.where:
+                count = estimated_count(self.object_list)
+            if count is None:
+                count = self.object_list.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+        return count
+
+
+class CachedCountPagination(CustomPageNumberPagination):
+    """Пагинация по страницам с кэшированным числом записей."""
+    django_paginator_class = CachedCountPaginator
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу сортировки (keyset).
+
+    Вместо OFFSET и COUNT(*) следующая страница выбирается условием
+    «строго после последней строки» по полям ordering, поэтому
+    стоимость страницы не зависит от её глубины. Курсор непрозрачен:
+    это base64 от значений полей последней строки.
+    """
+    cursor_query_param = "cursor"
+    page_size = settings.CUSTOM_PAGE_SIZE
+    page_size_query_param = "limit"
+    max_page_size = 100
+    invalid_cursor_message = "Неверный курсор."
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+        self.fields = [field.lstrip("-") for field in ordering]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        aliases = [f"keyset_{index}" for index in range(len(self.fields))]
+        queryset = queryset.annotate(
+            **{alias: F(field) for alias, field in zip(aliases, self.fields)}
+        ).order_by(*self.ordering)
+        values = self.decode_cursor(request)
+        if values is not None:
+            queryset = queryset.filter(self.after(values))
+        try:
+            rows = list(queryset[:self.page_size + 1])
+        except (ValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        self.has_next = len(rows) > self.page_size
+        page = rows[:self.page_size]
+        self.last = (
+            [getattr(page[-1], alias) for alias in aliases] if page else None
+        )
+        return page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def after(self, values):
+        """Условие «строка идёт после values» для составного ключа."""
+        condition = Q()
+        for index, (field, value) in enumerate(zip(self.ordering, values)):
+            lookup = "lt" if field.startswith("-") else "gt"
+            step = Q(**{f"{self.fields[index]}__{lookup}": value})
+            for name, previous in zip(self.fields[:index], values):
+                step &= Q(**{name: previous})
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return values
+
+    def encode_cursor(self, values):
+        # str() сохраняет микросекунды даты, в отличие от
+        # DjangoJSONEncoder, который обрезает их до миллисекунд.
+        raw = json.dumps(values, default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.last),
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+
+class KeysetPaginationMixin:
+    """
+    Включает KeysetPagination, если в запросе передан параметр cursor.
+
+    Без параметра работает обычная пагинация с limit и page, поэтому
+    существующий фронтенд не затрагивается. Первая страница в режиме
+    курсора запрашивается с пустым cursor.
+    """
+    keyset_ordering = ()
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            ordering = self.get_keyset_ordering()
+            if ordering and (
+                KeysetPagination.cursor_query_param
+                in self.request.query_params
+            ):
+                self._paginator = KeysetPagination(ordering)
+            else:
+                self._paginator = (
+                    self.pagination_class() if self.pagination_class
+                    else None
+                )
+        return self._paginator
@@ -0,0 +1,44 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
+from django.conf import settings
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Слишком большой запрос."
+    default_code = "request_too_large"
+
+
+class BodySizeLimitMixin:
+    """
+    Отклоняет запрос по заголовку Content-Length до чтения тела.
+
+    Так слишком большая загрузка не попадает в память воркера
+    целиком только ради того, чтобы потом не пройти валидацию.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        if request is not None:
+            length = request.META.get("CONTENT_LENGTH") or ""
+            if length.isdigit() and (
+                int(length) > settings.UPLOAD_MAX_BODY_SIZE
+            ):
+                raise RequestTooLarge()
+        return super().parse(stream, media_type, parser_context)
+
+
+class LimitedJSONParser(BodySizeLimitMixin, JSONParser):
+    pass
+
+
+class LimitedMultiPartParser(BodySizeLimitMixin, MultiPartParser):
+    pass
+
+
+class LimitedFormParser(BodySizeLimitMixin, FormParser):
+    pass
+
+
+UPLOAD_PARSERS = (LimitedJSONParser, LimitedMultiPartParser, LimitedFormParser)
@@ -0,0 +1,39 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Рендерер для ответов, которые формируются без сериализации.
+
+    Нужен только для согласования формата (заголовок Accept или
+    параметр format): сами данные отдаются потоковым или файловым
+    ответом и через рендерер не проходят. Служебные ответы (ошибки,
+    статус фоновой задачи) отдаются как JSON.
+    """
+
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, (bytes, str)):
+            return data
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+
+class PDFRenderer(PassthroughRenderer):
+    media_type = "application/pdf"
+    format = "pdf"
+
+
+class PlainTextRenderer(PassthroughRenderer):
+    media_type = "text/plain"
+    format = "txt"
+    charset = "utf-8"
+
+
+class CSVRenderer(PassthroughRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
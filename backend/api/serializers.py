@@ -3,10 +3,14 @@ from collections.abc import Hashable
 from rest_framework.serializers import ModelSerializer, SerializerMethodField
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
-from shortener.models import UrlMap
-from shortener.shortener import create
-from django.urls import reverse
-
+from django.conf import settings
+from django.db import transaction
+from django.http import QueryDict
+from django.db.models import CharField, Value
+
+from api.cache import invalidate_recipes
+from api.images import variant_urls
+from api.uploads import UploadImageField, form_data
 from users.models import User, Subscriptions
 from recipes.models import (
     Tag,
@@ -17,6 +21,92 @@ from recipes.models import (
     AmountIngredient
 )
 from recipes.constants import MIN_AMOUNT, MAX_AMOUNT
+from recipes.ingredient_index import ingredient_index
+from recipes.pantry import pantry_index
+from recipes.search import search_vectors_changed
+from recipes.short_links import short_code
+from recipes.utils import limit_per_group
+
+
+def get_subscribed_ids(context):
+    """
+    Множество id авторов, на которых подписан текущий пользователь.
+
+    Вычисляется одним запросом на весь запрос и хранится в общем
+    контексте сериализаторов, поэтому вложенные и списочные
+    сериализаторы не обращаются к базе для каждого объекта.
+    """
+    if "subscribed_ids" not in context:
+        request = context.get("request")
+        user = getattr(request, "user", None)
+        context["subscribed_ids"] = (
+            set(user.subscriptions.values_list("author_id", flat=True))
+            if user is not None and user.is_authenticated
+            else set()
+        )
+    return context["subscribed_ids"]
+
+
+def apply_user_overlay(request, documents):
+    """
+    Дополняет общие документы рецептов флагами текущего пользователя.
+
+    Документы рецептов не зависят от пользователя и кэшируются.
+    Флаги is_favorited, is_in_shopping_cart и author.is_subscribed
+    вычисляются одним запросом для всех документов сразу.
+    """
+    user = request.user
+    if not user.is_authenticated or not documents:
+        return documents
+    recipe_ids = [document["id"] for document in documents]
+    author_ids = {document["author"]["id"] for document in documents}
+    flags = set(
+        Favorites.objects.filter(user=user, recipe_id__in=recipe_ids)
+        .annotate(kind=Value("favorite", output_field=CharField()))
+        .order_by()
+        .values_list("recipe_id", "kind")
+        .union(
+            ShoppingCart.objects.filter(user=user, recipe_id__in=recipe_ids)
+            .annotate(kind=Value("cart", output_field=CharField()))
+            .order_by()
+            .values_list("recipe_id", "kind"),
+            Subscriptions.objects.filter(user=user, author_id__in=author_ids)
+            .annotate(kind=Value("author", output_field=CharField()))
+            .order_by()
+            .values_list("author_id", "kind"),
+            all=True,
+        )
+    )
+    return [
+        {
+            **document,
+            "author": {
+                **document["author"],
+                "is_subscribed": (document["author"]["id"], "author") in flags,
+            },
+            "is_favorited": (document["id"], "favorite") in flags,
+            "is_in_shopping_cart": (document["id"], "cart") in flags,
+        }
+        for document in documents
+    ]
+
+
+def get_ingredient_index(context):
+    """Справочник ингредиентов, один снимок на весь запрос."""
+    if "ingredient_index" not in context:
+        context["ingredient_index"] = ingredient_index.get()
+    return context["ingredient_index"]
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Адреса уменьшенных копий картинки рецепта, пока их нет — оригинала."""
+
+    def to_representation(self, value):
+        return variant_urls(
+            value.image,
+            value.image_variants_ready,
+            self.context.get("request"),
+        )
 
 
 class BaseSerializer(serializers.ModelSerializer):
@@ -87,16 +177,11 @@ class UserSerializer(ModelSerializer):
 
     def get_is_subscribed(self, obj):
         """Подписан ли пользователь на данного автора."""
-        request = self.context["request"]
-        user = request.user
-        return (
-            user.is_authenticated
-            and user.subscriptions.filter(author=obj).exists()
-        )
+        return obj.id in get_subscribed_ids(self.context)
 
 
 class AvatarSerializer(ModelSerializer):
-    avatar = Base64ImageField(required=True)
+    avatar = UploadImageField(required=True)
 
     class Meta:
         model = User
@@ -127,22 +212,38 @@ class IngredientSerializer(ModelSerializer):
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
-    """Сериализатор для связи рецептов с ингредиентами."""
+    """
+    Сериализатор для связи рецептов с ингредиентами.
 
-    id = serializers.ReadOnlyField(source="ingredients.id")
-    name = serializers.ReadOnlyField(source="ingredients.name")
-    measurement_unit = serializers.ReadOnlyField(
-        source="ingredients.measurement_unit"
-    )
+    Название и единица измерения берутся из справочника в памяти,
+    без join с таблицей ингредиентов.
+    """
+
+    id = serializers.ReadOnlyField(source="ingredients_id")
+    name = SerializerMethodField()
+    measurement_unit = SerializerMethodField()
 
     class Meta:
         model = AmountIngredient
         fields = ("id", "name", "measurement_unit", "amount")
 
+    def get_ingredient(self, obj):
+        item = get_ingredient_index(self.context).get(obj.ingredients_id)
+        if item is None:
+            item = (obj.ingredients.name, obj.ingredients.measurement_unit)
+        return item
+
+    def get_name(self, obj):
+        return self.get_ingredient(obj)[0]
+
+    def get_measurement_unit(self, obj):
+        return self.get_ingredient(obj)[1]
+
 
 class RecipeSerializer(serializers.ModelSerializer):
 
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source="*")
     author = UserSerializer(read_only=True)
     tags = TagsSerializer(many=True, read_only=True)
     ingredients = IngredientRecipeSerializer(
@@ -164,6 +265,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
@@ -184,9 +286,9 @@ class IngredientRecipeCreateSerializer(serializers.Serializer):
 
 
 class RecipeCreateSerializer(BaseSerializer):
-    image = Base64ImageField(required=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Tag.objects.all(), required=True
+    image = UploadImageField(required=True)
+    tags = serializers.ListField(
+        child=serializers.IntegerField(), required=True
     )
     ingredients = IngredientRecipeCreateSerializer(many=True, required=True)
     cooking_time = serializers.IntegerField(
@@ -209,11 +311,44 @@ class RecipeCreateSerializer(BaseSerializer):
             "cooking_time",
         )
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = form_data(
+                data, list_fields=("tags",), json_fields=("ingredients",)
+            )
+        return super().to_internal_value(data)
+
     def validate_ingredients(self, value):
-        return self.validate_non_empty_list("ingredients", value)
+        value = self.validate_non_empty_list("ingredients", value)
+        index = ingredient_index.get()
+        unknown = {
+            item["id"] for item in value if index.get(item["id"]) is None
+        }
+        # Снимок может отставать от базы: недавно добавленные
+        # ингредиенты проверяются запросом.
+        if unknown:
+            unknown -= set(
+                Ingredient.objects.filter(id__in=unknown)
+                .values_list("id", flat=True)
+            )
+        missing = [item["id"] for item in value if item["id"] in unknown]
+        if missing:
+            raise serializers.ValidationError(
+                f"Ингредиенты не найдены: {missing}"
+            )
+        return value
 
     def validate_tags(self, value):
-        return self.validate_non_empty_list("tags", value)
+        value = self.validate_non_empty_list("tags", value)
+        found = set(
+            Tag.objects.filter(id__in=value).values_list("id", flat=True)
+        )
+        missing = [tag_id for tag_id in value if tag_id not in found]
+        if missing:
+            raise serializers.ValidationError(
+                f"Теги не найдены: {missing}"
+            )
+        return value
 
     def validate_image(self, value):
         if not value:
@@ -236,22 +371,81 @@ class RecipeCreateSerializer(BaseSerializer):
             )
         except Exception as e:
             raise serializers.ValidationError(f"Ингредиенты не найдены: {e}")
+        invalidate_recipes([recipe.pk])
+        pantry_index.changed([recipe.id])
 
+    @transaction.atomic
     def create(self, validated_data: dict):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
         author = self.context.get("request").user
         recipe = Recipe.objects.create(author=author, **validated_data)
-        api_link = reverse("api:recipes-detail", args=[recipe.id])
-        short_link = create(
-            user=author, link=api_link.replace("/api", "")
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag_id=tag_id)
+            for tag_id in tags
         )
-        recipe.short_link = UrlMap.objects.get(short_url=short_link)
-        recipe.save()
-        recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
         return recipe
 
+    @staticmethod
+    def update_ingredients(ingredients, recipe):
+        """
+        Приводит ингредиенты рецепта к списку ingredients.
+
+        Сравнивает список с сохранённым и пишет только разницу:
+        новые строки, изменённые количества и удалённые ингредиенты.
+        Возвращает True, если что-то изменилось.
+        """
+        current = {
+            row.ingredients_id: row for row in recipe.recipe_ingredients.all()
+        }
+        submitted = {item["id"]: item["amount"] for item in ingredients}
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in submitted
+        ]
+        changed = []
+        for ingredient_id, amount in submitted.items():
+            row = current.get(ingredient_id)
+            if row is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        added = [
+            {"id": ingredient_id, "amount": amount}
+            for ingredient_id, amount in submitted.items()
+            if ingredient_id not in current
+        ]
+        if removed:
+            AmountIngredient.objects.filter(pk__in=removed).delete()
+        if changed:
+            AmountIngredient.objects.bulk_update(changed, ["amount"])
+        if added:
+            RecipeCreateSerializer.create_ingredients(added, recipe)
+            # Строки созданы без сигналов; при создании рецепта вектор
+            # пересчитывается по сигналу сохранения самого рецепта.
+            search_vectors_changed([recipe.pk])
+        elif changed:
+            invalidate_recipes([recipe.pk])
+        return bool(removed or changed or added)
+
+    @staticmethod
+    def update_tags(tags, recipe):
+        """Добавляет и удаляет только изменившиеся теги."""
+        current = {tag.id for tag in recipe.tags.all()}
+        submitted = set(tags)
+        if current - submitted:
+            recipe.tags.remove(*(current - submitted))
+        if submitted - current:
+            recipe.tags.add(*(submitted - current))
+
+    @staticmethod
+    def same_image(recipe, image):
+        """Совпадает ли загруженная картинка с уже сохранённой."""
+        field = recipe.image.field
+        name = field.generate_filename(recipe, image.name)
+        return field.storage.content_name(name, image) == recipe.image.name
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", None)
@@ -263,13 +457,26 @@ class RecipeCreateSerializer(BaseSerializer):
             raise serializers.ValidationError(
                 "Поле `tags` обязательно для обновления."
             )
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients(ingredients, instance)
-        return super().update(instance, validated_data)
+        self.update_tags(tags, instance)
+        self.update_ingredients(ingredients, instance)
+        image = validated_data.get("image")
+        if image is not None and self.same_image(instance, image):
+            del validated_data["image"]
+        changed = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed:
+            instance.save(update_fields=changed)
+        return instance
 
     def to_representation(self, instance):
-        return RecipeSerializer(instance, context=self.context).data
+        document = RecipeSerializer(
+            instance, context={**self.context, "subscribed_ids": set()}
+        ).data
+        return apply_user_overlay(self.context["request"], [document])[0]
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -279,10 +486,19 @@ class FavoriteSerializer(serializers.ModelSerializer):
         source="recipe.cooking_time", read_only=True
     )
     image = Base64ImageField(read_only=True, source="recipe.image")
+    image_variants = ImageVariantsField(source="recipe")
 
     class Meta:
         model = Favorites
-        fields = ("id", "name", "image", "cooking_time", "recipe", "user")
+        fields = (
+            "id",
+            "name",
+            "image",
+            "image_variants",
+            "cooking_time",
+            "recipe",
+            "user",
+        )
         validators = [
             serializers.UniqueTogetherValidator(
                 queryset=Favorites.objects.all(),
@@ -299,19 +515,53 @@ class FavoriteSerializer(serializers.ModelSerializer):
 class ShoppingSerializer(FavoriteSerializer):
     class Meta:
         model = ShoppingCart
-        fields = ("id", "name", "image", "cooking_time", "recipe", "user")
+        fields = (
+            "id",
+            "name",
+            "image",
+            "image_variants",
+            "cooking_time",
+            "recipe",
+            "user",
+        )
         extra_kwargs = {
             "recipe": {"write_only": True},
             "user": {"write_only": True},
         }
 
 
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit или None, если он не задан."""
+    limit = request.query_params.get("recipes_limit", "")
+    return int(limit) if limit.isdigit() else None
+
+
+def recipe_previews(author_ids, limit=None):
+    """
+    Рецепты авторов для превью подписок одним запросом.
+
+    С limit выбирается не больше limit последних рецептов каждого
+    автора прямо в SQL. Возвращает словарь author_id -> список рецептов.
+    """
+    queryset = Recipe.objects.filter(author_id__in=author_ids).only(
+        "id", "author_id", "name", "image", "image_variants_ready",
+        "cooking_time",
+    )
+    if limit is not None:
+        queryset = limit_per_group(queryset, "author_id", limit)
+    previews = {}
+    for recipe in queryset:
+        previews.setdefault(recipe.author_id, []).append(recipe)
+    return previews
+
+
 class RecipeForSubscribeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_variants = ImageVariantsField(source="*")
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
 
 
 class SubscribeSerializer(serializers.ModelSerializer):
@@ -321,11 +571,9 @@ class SubscribeSerializer(serializers.ModelSerializer):
     username = serializers.ReadOnlyField(source="author.username")
     first_name = serializers.ReadOnlyField(source="author.first_name")
     last_name = serializers.ReadOnlyField(source="author.last_name")
-    recipes = RecipeForSubscribeSerializer(
-        many=True, source="author.recipes", read_only=True
-    )
+    recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(read_only=True)
+    recipes_count = serializers.ReadOnlyField(source="author.recipes_count")
     avatar = serializers.SerializerMethodField()
 
     class Meta:
@@ -373,15 +621,46 @@ class SubscribeSerializer(serializers.ModelSerializer):
         user = self.context.get("request").user
         return user.is_authenticated and obj.user_id == user.id
 
-    def to_representation(self, instance):
-        request = self.context.get("request")
-        limit = request.query_params.get("recipes_limit", 0)
-        data = super().to_representation(instance)
-        if limit and limit.isdigit():
-            data["recipes"] = data["recipes"][:int(limit)]
-        recipes_count = instance.author.recipes.count()
-        data["recipes_count"] = recipes_count
-        return data
+    def get_recipes(self, obj):
+        """
+        Последние рецепты автора, не больше recipes_limit.
+
+        Для списка подписок превью всех авторов страницы загружаются
+        заранее одним запросом и передаются в context.
+        """
+        previews = self.context.get("recipe_previews")
+        if previews is None:
+            previews = recipe_previews(
+                [obj.author_id], get_recipes_limit(self.context["request"])
+            )
+        return RecipeForSubscribeSerializer(
+            previews.get(obj.author_id, []), many=True, context=self.context
+        ).data
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для массовых операций."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_ITEMS,
+    )
+
+
+class PantryQuerySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+    max_missing = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=100,
+        default=settings.PANTRY_RESULTS_LIMIT,
+    )
 
 
 class RecipeLinkSerializer(serializers.Serializer):
@@ -389,10 +668,7 @@ class RecipeLinkSerializer(serializers.Serializer):
 
     def get_short_link(self, obj):
         base_url = self.context.get("base_url", "")
-        if obj.short_link and obj.short_link.short_url:
-            short_links = obj.short_link.short_url
-            return f"{base_url}/s/{short_links}"
-        return ""
+        return f"{base_url}/s/{short_code(obj)}"
 
     def to_representation(self, obj):
         ret = super().to_representation(obj)
@@ -0,0 +1,95 @@
+"""Список покупок: агрегация ингредиентов и генерация PDF."""
+import csv
+import hashlib
+import json
+
+from django.conf import settings
+from django.db.models import Sum
+from django.template.loader import render_to_string
+
+from recipes.models import AmountIngredient
+
+PDF_FILENAME = "shortlist.pdf"
+
+
+def shopping_list_queryset(user):
+    """Суммарное количество каждого ингредиента из корзины пользователя."""
+    return (
+        AmountIngredient.objects.filter(recipe__shoppinga_cart__user=user)
+        .values_list("ingredients__name", "ingredients__measurement_unit")
+        .annotate(sum_amount=Sum("amount"))
+        .order_by("ingredients__name")
+    )
+
+
+def shopping_list_rows(user):
+    return [list(row) for row in shopping_list_queryset(user)]
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_text(rows):
+    for name, unit, amount in rows:
+        yield f"{name} ({unit}) — {amount}\n"
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(("name", "measurement_unit", "amount"))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_json(rows):
+    separator = ""
+    yield "["
+    for name, unit, amount in rows:
+        yield separator + json.dumps(
+            {"name": name, "measurement_unit": unit, "amount": amount},
+            ensure_ascii=False,
+        )
+        separator = ","
+    yield "]"
+
+
+STREAM_FORMATS = {
+    "txt": (iter_text, "text/plain; charset=utf-8", "shortlist.txt"),
+    "csv": (iter_csv, "text/csv; charset=utf-8", "shortlist.csv"),
+    "json": (iter_json, "application/json", "shortlist.json"),
+}
+
+
+def shopping_list_key(rows):
+    """Хеш содержимого списка покупок, используется как ключ кэша."""
+    return hashlib.sha256(
+        json.dumps(rows, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def render_pdf(payload):
+    """
+    Обработчик фоновой задачи: рендерит список покупок в PDF.
+
+    WeasyPrint импортируется здесь, чтобы его загружал только воркер,
+    а не каждый процесс веб-сервера.
+    """
+    from weasyprint import CSS, HTML
+
+    ingredients = [
+        {
+            "ingredients__name": name,
+            "ingredients__measurement_unit": unit,
+            "sum_amount": amount,
+        }
+        for name, unit, amount in payload["rows"]
+    ]
+    html = render_to_string("shopping_cart.html", {"ingredients": ingredients})
+    content = HTML(string=html).write_pdf(
+        stylesheets=[CSS(f"{settings.STATICFILES_DIRS[0]}/css/pdf.css")]
+    )
+    return PDF_FILENAME, content
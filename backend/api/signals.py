@@ -0,0 +1,122 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from api import jobs
+from api.cache import (
+    TAGS_VERSION,
+    invalidate_recipes,
+    invalidate_user_state,
+)
+from api.images import job_key, variants_ready
+from recipes.models import (
+    AmountIngredient,
+    Favorites,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from recipes.snapshots import bump_versions
+from users.models import Subscriptions, User
+
+AUTHOR_FIELDS = {"email", "username", "first_name", "last_name", "avatar"}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, raw=False, **kwargs):
+    """Ставит в очередь раздачу нового рецепта по лентам подписчиков."""
+    if created and not raw:
+        jobs.enqueue(
+            "feed_fan_out",
+            f"feed-fan-out:{instance.pk}",
+            {"recipe": instance.pk},
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, update_fields, raw=False, **kwargs):
+    """
+    Обновляет готовность копий новой картинки рецепта.
+
+    Одна картинка может быть общей для нескольких рецептов, поэтому её
+    копии уже могут существовать. Если их нет, генерация ставится в
+    очередь.
+    """
+    if raw or not instance.image:
+        return
+    if update_fields is not None and "image" not in update_fields:
+        return
+    name = instance.image.name
+    ready = variants_ready(name)
+    if ready != instance.image_variants_ready:
+        Recipe.objects.filter(pk=instance.pk).update(
+            image_variants_ready=ready
+        )
+        instance.image_variants_ready = ready
+    if not ready:
+        jobs.enqueue("image_variants", job_key(name), {"name": name})
+
+
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_relations_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_recipes([instance.pk])
+    elif pk_set:
+        invalidate_recipes(pk_set)
+    else:
+        invalidate_recipes()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    bump_versions([TAGS_VERSION])
+    invalidate_recipes(instance.recipes.values_list("id", flat=True))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes(
+        instance.ingredient_recipes.values_list("recipe_id", flat=True)
+    )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    recipe_ids = list(instance.recipes.values_list("id", flat=True))
+    if recipe_ids:
+        invalidate_recipes(recipe_ids)
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_delete, sender=Favorites)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscriptions)
+@receiver(post_delete, sender=Subscriptions)
+def user_state_changed(sender, instance, **kwargs):
+    invalidate_user_state([instance.user_id])
@@ -0,0 +1,139 @@
+"""
+Добавление и удаление одного рецепта в избранном или корзине.
+
+На PostgreSQL каждое действие — один запрос: вставка с
+ON CONFLICT DO NOTHING (дубликаты отсекает уникальное ограничение, а
+не предварительная проверка) или удаление с RETURNING, а счётчик
+рецепта меняется в том же запросе. Сигналы моделей при этом не
+срабатывают, версия состояния пользователя сбрасывается явно. На
+других СУБД действия выполняются обычными запросами ORM.
+"""
+from django.db import IntegrityError, connection, transaction
+from django.db.models import UniqueConstraint
+
+from api.bulk import CREATED, DELETED, EXISTS, MISSING, NOT_FOUND
+from api.cache import invalidate_user_state
+from recipes.counters import COUNTERS
+from recipes.models import Recipe
+
+RECIPE_FIELDS = (
+    "id", "name", "image", "image_variants_ready", "cooking_time"
+)
+
+ADD_SQL = """
+WITH added AS (
+    INSERT INTO {link} ({user}, {recipe})
+    SELECT %(user)s, {recipe_pk} FROM {recipes} WHERE {recipe_pk} = %(pk)s
+    ON CONFLICT ON CONSTRAINT {constraint} DO NOTHING
+    RETURNING {recipe}
+), counted AS (
+    UPDATE {recipes} SET {counter} = {counter} + 1
+    FROM added WHERE {recipes}.{recipe_pk} = added.{recipe}
+    RETURNING {recipes}.{recipe_pk}
+)
+SELECT {fields}, counted.{recipe_pk} IS NOT NULL
+FROM {recipes} LEFT JOIN counted
+    ON counted.{recipe_pk} = {recipes}.{recipe_pk}
+WHERE {recipes}.{recipe_pk} = %(pk)s
+"""
+
+REMOVE_SQL = """
+WITH removed AS (
+    DELETE FROM {link} WHERE {user} = %(user)s AND {recipe} = %(pk)s
+    RETURNING {recipe}
+), counted AS (
+    UPDATE {recipes} SET {counter} = {counter} - 1
+    FROM removed WHERE {recipes}.{recipe_pk} = removed.{recipe}
+    RETURNING {recipes}.{recipe_pk}
+)
+SELECT counted.{recipe_pk} IS NOT NULL
+FROM {recipes} LEFT JOIN counted
+    ON counted.{recipe_pk} = {recipes}.{recipe_pk}
+WHERE {recipes}.{recipe_pk} = %(pk)s
+"""
+
+
+def sql_names(relation):
+    """Имена таблиц и колонок для SQL-шаблонов."""
+    quote = connection.ops.quote_name
+    model = relation.model
+    counter = next(
+        spec.field for spec in COUNTERS
+        if spec.source is model and spec.model is Recipe
+    )
+    constraint = next(
+        constraint.name for constraint in model._meta.constraints
+        if isinstance(constraint, UniqueConstraint)
+    )
+    return {
+        "link": quote(model._meta.db_table),
+        "user": quote(model._meta.get_field("user").column),
+        "recipe": quote(relation.foreign_key),
+        "recipes": quote(Recipe._meta.db_table),
+        "recipe_pk": quote(Recipe._meta.pk.column),
+        "counter": quote(counter),
+        "constraint": quote(constraint),
+        "fields": ", ".join(
+            f"{quote(Recipe._meta.db_table)}."
+            f"{quote(Recipe._meta.get_field(field).column)}"
+            for field in RECIPE_FIELDS
+        ),
+    }
+
+
+def add(relation, user, pk):
+    """
+    Добавляет рецепт, возвращает статус и рецепт.
+
+    Статус CREATED или EXISTS вместе с рецептом (только нужные для
+    ответа поля), NOT_FOUND без рецепта.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                ADD_SQL.format(**sql_names(relation)),
+                {"user": user.id, "pk": pk},
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return NOT_FOUND, None
+        *values, created = row
+        recipe = Recipe.from_db(connection.alias, RECIPE_FIELDS, values)
+    else:
+        recipe = Recipe.objects.filter(pk=pk).only(*RECIPE_FIELDS).first()
+        if recipe is None:
+            return NOT_FOUND, None
+        try:
+            with transaction.atomic():
+                _, created = relation.model.objects.get_or_create(
+                    user=user, recipe=recipe
+                )
+        except IntegrityError:
+            created = False
+    if not created:
+        return EXISTS, recipe
+    if connection.vendor == "postgresql":
+        invalidate_user_state([user.id])
+    return CREATED, recipe
+
+
+def remove(relation, user, pk):
+    """Удаляет рецепт, возвращает DELETED, MISSING или NOT_FOUND."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                REMOVE_SQL.format(**sql_names(relation)),
+                {"user": user.id, "pk": pk},
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return NOT_FOUND
+        if row[0]:
+            invalidate_user_state([user.id])
+        return DELETED if row[0] else MISSING
+    deleted, _ = relation.model.objects.filter(
+        user=user, **{relation.foreign_key: pk}
+    ).delete()
+    if deleted:
+        return DELETED
+    return MISSING if Recipe.objects.filter(pk=pk).exists() else NOT_FOUND
@@ -0,0 +1,196 @@
+"""
+Приём картинок без лишних копий в памяти.
+
+Картинка приходит либо строкой base64 в JSON, либо файлом в
+multipart. Строка декодируется частями во временный файл, который
+при превышении FILE_UPLOAD_MAX_MEMORY_SIZE уходит на диск. Размер
+проверяется до декодирования, формат и размеры в пикселях — по
+заголовку файла, как только он прочитан, без декодирования пикселей.
+"""
+import base64
+import binascii
+import io
+import json
+import re
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+# Сколько символов строки base64 читается за раз.
+CHUNK_SIZE = 64 * 1024
+# Дальше этого заголовок картинки не ищется.
+HEADER_LIMIT = 1024 * 1024
+DATA_URL = re.compile(r"data:(?P<mime>[\w/+.-]+);base64,")
+# Символы вне алфавита base64 (например, переносы строк MIME)
+# b64decode пропускает, поэтому они отбрасываются до разбиения на
+# группы по 4 символа.
+NOT_BASE64 = re.compile(r"[^A-Za-z0-9+/=]")
+WHITESPACE = " \t\r\n"
+
+
+class HeaderProbe:
+    """Накапливает начало файла, пока по нему не откроется картинка."""
+
+    def __init__(self):
+        self.head = b""
+        self.image = None
+
+    def feed(self, data):
+        if self.image is not None or len(self.head) >= HEADER_LIMIT:
+            return
+        self.head += data[:HEADER_LIMIT - len(self.head)]
+        try:
+            self.image = Image.open(io.BytesIO(self.head))
+        except Image.DecompressionBombError:
+            # Заголовок обещает больше пикселей, чем допускает Pillow.
+            raise too_large()
+        except (OSError, SyntaxError, ValueError):
+            return
+        check_header(self.image)
+
+    def finish(self):
+        if self.image is None:
+            raise serializers.ValidationError(
+                "Загруженный файл не является изображением."
+            )
+
+
+def check_size(size):
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        limit = settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)
+        raise serializers.ValidationError(
+            f"Размер изображения больше {limit} МБ."
+        )
+
+
+def check_header(image):
+    if image.format not in settings.IMAGE_UPLOAD_FORMATS:
+        raise serializers.ValidationError(
+            f"Формат {image.format} не поддерживается."
+        )
+    if max(image.size) > settings.IMAGE_UPLOAD_MAX_DIMENSION:
+        raise too_large()
+
+
+def too_large():
+    return serializers.ValidationError(
+        "Изображение больше "
+        f"{settings.IMAGE_UPLOAD_MAX_DIMENSION} пикселей по стороне."
+    )
+
+
+def decoded_size(data, start):
+    """
+    Размер данных после декодирования строки base64 с позиции start.
+
+    Пробелы и переносы строк (base64 в формате MIME) не учитываются.
+    """
+    length = len(data) - start - sum(
+        data.count(char, start) for char in WHITESPACE
+    )
+    tail = data[max(start, len(data) - 8):].rstrip(WHITESPACE)
+    return length // 4 * 3 - tail[-2:].count("=")
+
+
+def decode_base64(data):
+    """Декодирует строку base64 частями во временный файл."""
+    match = DATA_URL.match(data)
+    start = match.end() if match else 0
+    check_size(decoded_size(data, start))
+    probe = HeaderProbe()
+    file = SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    size = 0
+    rest = ""
+    try:
+        for offset in range(start, len(data), CHUNK_SIZE):
+            text = rest + NOT_BASE64.sub("", data[offset:offset + CHUNK_SIZE])
+            # Хвост, не кратный 4, переходит в следующую часть.
+            whole = len(text) - len(text) % 4
+            text, rest = text[:whole], text[whole:]
+            chunk = base64.b64decode(text)
+            probe.feed(chunk)
+            file.write(chunk)
+            size += len(chunk)
+            check_size(size)
+        if rest:
+            base64.b64decode(rest)
+    except (binascii.Error, ValueError):
+        file.close()
+        raise serializers.ValidationError(
+            "Некорректная строка base64."
+        )
+    except serializers.ValidationError:
+        file.close()
+        raise
+    probe.finish()
+    file.seek(0)
+    extension = probe.image.format.lower().replace("jpeg", "jpg")
+    return UploadedFile(
+        file,
+        name=f"{uuid.uuid4()}.{extension}",
+        content_type=Image.MIME.get(probe.image.format),
+        size=size,
+    )
+
+
+def check_upload(upload):
+    """Проверяет файл из multipart, читая только его заголовок."""
+    check_size(upload.size)
+    probe = HeaderProbe()
+    for chunk in upload.chunks():
+        probe.feed(chunk)
+        if probe.image is not None or len(probe.head) >= HEADER_LIMIT:
+            break
+    probe.finish()
+    upload.seek(0)
+    return upload
+
+
+class UploadImageField(Base64ImageField):
+    """
+    Картинка строкой base64 или файлом multipart.
+
+    В отличие от Base64ImageField не держит в памяти второй полной
+    копии декодированной строки и отклоняет слишком большие или
+    неподдерживаемые картинки до полного чтения.
+    """
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, str):
+            upload = decode_base64(data)
+        elif isinstance(data, UploadedFile):
+            upload = check_upload(data)
+        else:
+            raise serializers.ValidationError(
+                "Ожидается строка base64 или файл."
+            )
+        return serializers.ImageField.to_internal_value(self, upload)
+
+
+def form_data(data, list_fields=(), json_fields=()):
+    """
+    Приводит данные multipart к виду, в котором они приходят в JSON.
+
+    Повторяющиеся поля list_fields собираются в списки, а поля
+    json_fields разбираются как JSON.
+    """
+    result = {key: data.get(key) for key in data}
+    for key in list_fields:
+        if key in data:
+            result[key] = data.getlist(key)
+    for key in json_fields:
+        if isinstance(result.get(key), str):
+            try:
+                result[key] = json.loads(result[key])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {key: "Некорректный JSON."}
+                )
+    return result
@@ -4,28 +4,52 @@ from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.viewsets import ReadOnlyModelViewSet
+from rest_framework.renderers import JSONRenderer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Exists, OuterRef, Sum, Count
+from django.db import transaction
+from django.db.models import Sum
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse, HttpResponseBadRequest
-from django.template.loader import render_to_string
-from weasyprint import HTML, CSS
+from django.http import (
+    Http404,
+    FileResponse,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
 from django.conf import settings
 
+from recipes.ingredient_index import ingredient_index
+from recipes.pantry import pantry_index
 from recipes.models import (
     Tag,
     Recipe,
     Ingredient,
-    ShoppingCart,
-    Favorites,
-    AmountIngredient
+    FeedItem,
+    RecipeSimilarity,
+)
+from api import bulk, jobs, toggles
+from api.cache import (
+    RECIPE_LIST_VERSION,
+    TAGS_VERSION,
+    cached_anonymous_response,
+    conditional_response,
+    recipe_version_key,
 )
-from api.pagination import CustomPageNumberPagination
+from api.documents import recipe_documents
+from api.models import Job
+from api.pagination import (
+    CachedCountPagination,
+    KeysetPagination,
+    KeysetPaginationMixin,
+)
+from api.parsers import UPLOAD_PARSERS
 from api.permissions import IsAuthAdminAuthorOrReadOnly
+from api.renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
 from api.serializers import (
     AvatarSerializer,
+    BulkIdsSerializer,
     TagsSerializer,
     IngredientSerializer,
     RecipeCreateSerializer,
@@ -33,49 +57,255 @@ from api.serializers import (
     ShoppingSerializer,
     FavoriteSerializer,
     SubscribeSerializer,
-    RecipeLinkSerializer
+    RecipeLinkSerializer,
+    PantryQuerySerializer,
+    apply_user_overlay,
+    get_recipes_limit,
+    recipe_previews,
 )
 from users.models import User, Subscriptions
 from .filters import RecipeFilter, IngredientFilter
+from .shopping_list import (
+    STREAM_FORMATS,
+    shopping_list_key,
+    shopping_list_queryset,
+    shopping_list_rows,
+)
+
+
+def bulk_response(request, relation):
+    """Массовое добавление (POST) или удаление (DELETE) связей."""
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    change = bulk.add if request.method == "POST" else bulk.remove
+    return Response({
+        "results": change(
+            relation, request.user, serializer.validated_data["ids"]
+        )
+    })
 
 
 class TagsViewSet(ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
 
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            [TAGS_VERSION],
+            lambda: super(TagsViewSet, self).list(request, *args, **kwargs),
+            max_age=settings.REFERENCE_CACHE_MAX_AGE,
+            per_user=False,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            [TAGS_VERSION],
+            lambda: super(TagsViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+            max_age=settings.REFERENCE_CACHE_MAX_AGE,
+            per_user=False,
+        )
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(KeysetPaginationMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeCreateSerializer
     permission_classes = (IsAuthAdminAuthorOrReadOnly,)
-    pagination_class = CustomPageNumberPagination
+    parser_classes = UPLOAD_PARSERS
+    pagination_class = CachedCountPagination
+    keyset_ordering = ("-pub_date", "-id")
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_keyset_ordering(self):
+        """
+        Поиск сортирует по релевантности, а курсор — по дате, поэтому
+        вместе их использовать нельзя.
+        """
+        params = self.request.query_params
+        if (
+            KeysetPagination.cursor_query_param in params
+            and params.get("search", "").strip()
+        ):
+            raise ValidationError(
+                {"cursor": ["Курсор нельзя использовать вместе с поиском."]}
+            )
+        return self.keyset_ordering
+
     def get_queryset(self):
         queryset = super().get_queryset()
-        if self.request.user.is_authenticated:
-            is_in_shopping_cart_subquery = Exists(
-                self.request.user.shoppinga_cart.filter(
-                    recipe_id=OuterRef("id")
-                )
-            )
-            is_favorited_subquery = Exists(
-                self.request.user.favorites.filter(recipe_id=OuterRef("id"))
-            )
-            queryset = queryset.annotate(
-                is_in_shopping_cart=is_in_shopping_cart_subquery,
-                is_favorited=is_favorited_subquery,
-            )
-        queryset = queryset.select_related("author")
-        queryset = queryset.prefetch_related("recipe_ingredients", "tags")
-        return queryset
+        if self.action == "list":
+            return queryset.only("id")
+        return queryset.select_related("author").prefetch_related(
+            "recipe_ingredients", "tags"
+        )
 
     def get_serializer_class(self):
         if self.request.method == "GET":
             return RecipeSerializer
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            [RECIPE_LIST_VERSION],
+            lambda: cached_anonymous_response(
+                request, [RECIPE_LIST_VERSION], self.render_list
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        keys = [recipe_version_key(kwargs["pk"])]
+        return conditional_response(
+            request,
+            keys,
+            lambda: cached_anonymous_response(
+                request, keys, self.render_detail
+            ),
+        )
+
+    def render_list(self):
+        """
+        Страница рецептов из кэшированных документов.
+
+        Фильтрация и пагинация выбирают только id рецептов, сами
+        документы берутся из кэша и дополняются флагами пользователя.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        recipes = page if page is not None else queryset
+        data = apply_user_overlay(
+            self.request,
+            recipe_documents(self.request, [recipe.id for recipe in recipes]),
+        )
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def render_detail(self):
+        pk = self.kwargs["pk"]
+        if not pk.isdigit():
+            raise Http404
+        documents = recipe_documents(self.request, [int(pk)])
+        if not documents:
+            raise Http404
+        return Response(apply_user_overlay(self.request, documents)[0])
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """
+        Лента рецептов авторов, на которых подписан пользователь.
+
+        Читается из заранее собранной ленты FeedItem, страницы
+        выбираются по курсору (параметры cursor и limit).
+        """
+        paginator = KeysetPagination(("-pub_date", "-recipe_id"))
+        page = paginator.paginate_queryset(
+            FeedItem.objects.filter(user=request.user).only("recipe_id"),
+            request,
+            self,
+        )
+        data = apply_user_overlay(
+            request,
+            recipe_documents(request, [item.recipe_id for item in page]),
+        )
+        return paginator.get_paginated_response(data)
+
+    def get_results_limit(self, default):
+        limit = self.request.query_params.get("limit", "")
+        return min(int(limit), 100) if limit.isdigit() else default
+
+    def render_ranked(self, recipe_ids):
+        documents = apply_user_overlay(
+            self.request, recipe_documents(self.request, recipe_ids)
+        )
+        return Response({"results": documents})
+
+    @action(methods=("get",), detail=True)
+    def similar(self, request, pk=None):
+        """Рецепты, которые часто добавляют в избранное вместе с этим."""
+        if not pk.isdigit():
+            raise Http404
+        recipe_ids = list(
+            RecipeSimilarity.objects.filter(recipe_id=pk).values_list(
+                "similar_id", flat=True
+            )[:self.get_results_limit(settings.RECOMMENDATIONS_TOP_K)]
+        )
+        if not recipe_ids and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        return self.render_ranked(recipe_ids)
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+    )
+    def recommended(self, request):
+        """
+        Рекомендации пользователю.
+
+        Сходство соседей всех избранных рецептов суммируется, уже
+        добавленные в избранное рецепты исключаются.
+        """
+        recipe_ids = list(
+            RecipeSimilarity.objects.filter(
+                recipe__favorites__user=request.user
+            )
+            .exclude(similar__favorites__user=request.user)
+            .values("similar_id")
+            .annotate(total=Sum("score"))
+            .order_by("-total", "similar_id")
+            .values_list("similar_id", flat=True)[
+                :self.get_results_limit(settings.CUSTOM_PAGE_SIZE)
+            ]
+        )
+        return self.render_ranked(recipe_ids)
+
+    @action(methods=("get",), detail=False)
+    def cook(self, request):
+        """
+        Что приготовить из имеющихся ингредиентов.
+
+        Принимает id ингредиентов (параметр ingredients, можно
+        несколько раз) и возвращает рецепты по возрастанию числа
+        недостающих ингредиентов и убыванию доли имеющихся.
+        """
+        query = PantryQuerySerializer(
+            data={
+                **request.query_params.dict(),
+                "ingredients": request.query_params.getlist("ingredients"),
+            }
+        )
+        query.is_valid(raise_exception=True)
+        matches = {
+            recipe_id: (missing, coverage)
+            for recipe_id, missing, coverage in pantry_index.get().match(
+                query.validated_data["ingredients"],
+                query.validated_data["limit"],
+                query.validated_data.get("max_missing"),
+            )
+        }
+        documents = apply_user_overlay(
+            request, recipe_documents(request, list(matches))
+        )
+        return Response({
+            "results": [
+                {
+                    **document,
+                    "missing_count": matches[document["id"]][0],
+                    "coverage": round(matches[document["id"]][1], 4),
+                }
+                for document in documents
+            ]
+        })
+
     @action(
         methods=["post", "delete"],
         detail=True,
@@ -83,24 +313,15 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def favorite(self, request, pk=None):
         """Избранные рецепты."""
-        recipe = self.get_object()
-        user = request.user
-        if request.method == "POST":
-            serializer = FavoriteSerializer(
-                data={"recipe": recipe.id, "user": user.id}
-            )
-            serializer.is_valid(raise_exception=True)
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        try:
-            favor = Favorites.objects.get(recipe=recipe, user=user)
-            favor.delete()
-            return Response(
-                {"message": "Рецепт удален из избранных"},
-                status=status.HTTP_204_NO_CONTENT,
-            )
-        except Favorites.DoesNotExist:
-            return HttpResponseBadRequest("Рецепт не найден в избранных.")
+        return self.toggle(
+            request,
+            pk,
+            bulk.FAVORITES,
+            FavoriteSerializer,
+            exists={"non_field_errors": ["Рецепт уже находится в избранных"]},
+            removed={"message": "Рецепт удален из избранных"},
+            missing="Рецепт не найден в избранных.",
+        )
 
     @action(
         methods=["post", "delete"],
@@ -109,67 +330,172 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def shopping_cart(self, request, pk=None):
         """Список покупок."""
-        recipe = get_object_or_404(Recipe, id=pk)
-        user = request.user
+        return self.toggle(
+            request,
+            pk,
+            bulk.SHOPPING_CART,
+            ShoppingSerializer,
+            exists={"message": "Рецепт уже в корзине."},
+            removed={"message": "Рецепт удален из списка покупок"},
+            missing="Рецепт не найден в корзине.",
+        )
+
+    def toggle(self, request, pk, relation, serializer_class, exists,
+               removed, missing):
+        """
+        Добавление (POST) или удаление (DELETE) рецепта одним запросом.
+
+        Повторное добавление не приводит к ошибке базы: дубликат
+        определяет уникальное ограничение, и клиент получает 400.
+        """
+        if not pk.isdigit():
+            raise Http404
         if request.method == "POST":
-            serializer = ShoppingSerializer(
-                data={"recipe": recipe.id, "user": user.id}
-            )
-            serializer.is_valid(raise_exception=True)
-            if user.shoppinga_cart.filter(recipe=recipe).exists():
-                return Response(
-                    {"message": "Рецепт уже в корзине."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            serializer.save()
-            return Response(
-                serializer.data,
-                status=status.HTTP_201_CREATED
+            result, recipe = toggles.add(relation, request.user, int(pk))
+            if result == bulk.NOT_FOUND:
+                raise Http404
+            if result == bulk.EXISTS:
+                return Response(exists, status=status.HTTP_400_BAD_REQUEST)
+            serializer = serializer_class(
+                relation.model(user=request.user, recipe=recipe)
             )
-        try:
-            cart = ShoppingCart.objects.get(recipe=recipe, user=user)
-            cart.delete()
-            return Response({"message": "Рецепт удален из списка покупок"},
-                            status=status.HTTP_204_NO_CONTENT,
-                            )
-        except ShoppingCart.DoesNotExist:
-            return HttpResponseBadRequest("Рецепт не найден в корзине.")
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        result = toggles.remove(relation, request.user, int(pk))
+        if result == bulk.NOT_FOUND:
+            raise Http404
+        if result == bulk.MISSING:
+            return HttpResponseBadRequest(missing)
+        return Response(removed, status=status.HTTP_204_NO_CONTENT)
+
+    @action(
+        methods=["post", "delete"],
+        detail=False,
+        url_path="favorite/bulk",
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_bulk(self, request):
+        """Добавление и удаление нескольких рецептов в избранном."""
+        return bulk_response(request, bulk.FAVORITES)
+
+    @action(
+        methods=["post", "delete"],
+        detail=False,
+        url_path="shopping_cart/bulk",
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request):
+        """Добавление и удаление нескольких рецептов в списке покупок."""
+        return bulk_response(request, bulk.SHOPPING_CART)
 
     @action(
         methods=("get",),
         detail=False,
         permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            PDFRenderer, PlainTextRenderer, CSVRenderer, JSONRenderer
+        ),
     )
     def download_shopping_cart(self, request):
-        """Скачать список покупок."""
-        ingredients = (
-            AmountIngredient.objects.filter(
-                recipe__shoppinga_cart__user=request.user)
-            .values("ingredients__name", "ingredients__measurement_unit")
-            .annotate(sum_amount=Sum("amount"))
-        )
-
-        html = render_to_string(
-            "shopping_cart.html",
-            {"ingredients": ingredients}
-        )
+        """
+        Скачать список покупок.
 
-        response = HttpResponse(content_type="application/pdf")
-        response["Content-Disposition"] = "attachment; filename=shortlist.pdf"
-        HTML(string=html).write_pdf(response, stylesheets=[
-            CSS(f"{settings.STATICFILES_DIRS[0]}/css/pdf.css")])
+        Формат выбирается параметром format (pdf, txt, csv, json) или
+        заголовком Accept, по умолчанию pdf. Текстовые форматы
+        отдаются потоком прямо из агрегирующего запроса.
 
-        return response
+        PDF генерируется фоновым воркером и кэшируется по хешу
+        содержимого списка. Запрос не ждёт воркер: пока файл не готов,
+        возвращается 202 со статусом задачи, и клиент повторяет тот же
+        запрос. Задача определяется текущим списком покупок
+        пользователя, поэтому чужой файл получить нельзя; задача,
+        завершившаяся ошибкой, ставится в очередь заново.
+        """
+        file_format = request.accepted_renderer.format
+        if file_format in STREAM_FORMATS:
+            generate, content_type, filename = STREAM_FORMATS[file_format]
+            response = StreamingHttpResponse(
+                generate(shopping_list_queryset(request.user).iterator()),
+                content_type=content_type,
+            )
+            response["Content-Disposition"] = (
+                f"attachment; filename={filename}"
+            )
+            return response
+        rows = shopping_list_rows(request.user)
+        job = jobs.enqueue(
+            "shopping_list_pdf", shopping_list_key(rows), {"rows": rows}
+        )
+        if job.status == Job.DONE:
+            return FileResponse(
+                job.result.open("rb"),
+                as_attachment=True,
+                filename="shortlist.pdf",
+                content_type="application/pdf",
+            )
+        return Response(
+            {"job": job.key, "status": job.status},
+            status=status.HTTP_202_ACCEPTED,
+        )
 
 
 class IngredientViewSet(ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            [ingredient_index.key],
+            lambda: self.render_list(request, *args, **kwargs),
+            max_age=settings.REFERENCE_CACHE_MAX_AGE,
+            per_user=False,
+        )
 
-class UserViewSet(DjoserUserViewSet):
-    pagination_class = CustomPageNumberPagination
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            [ingredient_index.key],
+            lambda: self.render_detail(request, *args, **kwargs),
+            max_age=settings.REFERENCE_CACHE_MAX_AGE,
+            per_user=False,
+        )
+
+    def render_list(self, request, *args, **kwargs):
+        """Список и автодополнение из справочника в памяти процесса."""
+        if not settings.INGREDIENT_MEMORY_INDEX:
+            return super().list(request, *args, **kwargs)
+        index = ingredient_index.get()
+        name = request.query_params.get("name")
+        ids = (
+            index.search(
+                name,
+                settings.INGREDIENT_AUTOCOMPLETE_LIMIT,
+                settings.INGREDIENT_TRIGRAM_SEARCH,
+            )
+            if name
+            else index.ids
+        )
+        return Response([index.as_dict(item) for item in ids])
+
+    def render_detail(self, request, *args, **kwargs):
+        if not settings.INGREDIENT_MEMORY_INDEX:
+            return super().retrieve(request, *args, **kwargs)
+        index = ingredient_index.get()
+        pk = self.kwargs["pk"]
+        if not pk.isdigit() or index.get(int(pk)) is None:
+            raise Http404
+        return Response(index.as_dict(int(pk)))
+
+
+class UserViewSet(KeysetPaginationMixin, DjoserUserViewSet):
+    pagination_class = CachedCountPagination
+
+    def get_keyset_ordering(self):
+        if self.action == "subscriptions":
+            return ("author__email", "id")
+        return ()
 
     @action(detail=False,
             methods=["get", "patch", ],
@@ -206,7 +532,8 @@ class UserViewSet(DjoserUserViewSet):
                 context={"request": request},
             )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         try:
             get_object_or_404(User, id=id)
@@ -219,6 +546,16 @@ class UserViewSet(DjoserUserViewSet):
         except Subscriptions.DoesNotExist:
             return HttpResponseBadRequest("Subscription does not exist.")
 
+    @action(
+        methods=["post", "delete"],
+        detail=False,
+        url_path="subscribe/bulk",
+        permission_classes=(IsAuthenticated,),
+    )
+    def subscribe_bulk(self, request):
+        """Подписка на нескольких авторов и отписка от них."""
+        return bulk_response(request, bulk.SUBSCRIPTIONS)
+
     @action(
         detail=False,
         methods=["GET"],
@@ -227,14 +564,18 @@ class UserViewSet(DjoserUserViewSet):
     def subscriptions(self, request):
         """Список подписок на авторов."""
         user = request.user
-        subscribe = (
-            user.subscriptions.prefetch_related("author__recipes")
-            .annotate(recipes_count=Count("author__recipes"))
-            .order_by("author__email")
+        subscribe = user.subscriptions.select_related("author").order_by(
+            "author__email"
         )
         page = self.paginate_queryset(subscribe)
+        previews = recipe_previews(
+            [subscription.author_id for subscription in page],
+            get_recipes_limit(request),
+        )
         serializer = SubscribeSerializer(
-            page, many=True, context={"request": request}
+            page,
+            many=True,
+            context={"request": request, "recipe_previews": previews},
         )
         return self.get_paginated_response(serializer.data)
 
@@ -242,6 +583,7 @@ class UserViewSet(DjoserUserViewSet):
 class AvatarView(APIView):
     permission_classes = [IsAuthAdminAuthorOrReadOnly]
     serializer_class = AvatarSerializer
+    parser_classes = UPLOAD_PARSERS
 
     def put(self, request):
         user = User.objects.get(pk=request.user.pk)
@@ -259,8 +601,10 @@ class AvatarView(APIView):
     def delete(self, request):
         user = User.objects.get(pk=request.user.pk)
         if user.avatar:
-            user.avatar.delete()
-            user.save()
+            # Файл не удаляется: в ContentAddressedStorage одинаковые
+            # картинки разных пользователей хранятся в одном файле.
+            user.avatar = None
+            user.save(update_fields=["avatar"])
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         return Response(status=status.HTTP_404_NOT_FOUND)
@@ -268,7 +612,12 @@ class AvatarView(APIView):
 
 class RecipeLinkView(APIView):
     def get(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
+        recipe = get_object_or_404(
+            Recipe.objects.select_related("short_link").only(
+                "id", "short_link__short_url"
+            ),
+            id=pk,
+        )
         full_url = request.build_absolute_uri()
         base_url = "/".join(full_url.split("/")[:-5])
         serializer = RecipeLinkSerializer(
@@ -72,6 +72,32 @@ DATABASES = {
     }
 }
 
+if os.getenv('USE_SQLITE', 'False') == 'True':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Версии кэша и снимков видны всем процессам (gunicorn, воркер,
+# команды manage.py), только если кэш общий. В продакшене задайте
+# memcached (см. .env.example); проверка `check --deploy` не пропустит
+# локальный для процесса кэш.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+# Не дольше этого снимки в памяти процесса (справочник ингредиентов,
+# поисковый индекс) живут без перепроверки.
+SNAPSHOT_MAX_AGE = 60
+
+# Время жизни кэшированных ответов API для анонимных пользователей.
+RECIPE_CACHE_TIMEOUT = 300
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -135,4 +161,72 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.UserProfile'
 
-CUSTOM_PAGE_SIZE = 10
\ No newline at end of file
+CUSTOM_PAGE_SIZE = 10
+
+INGREDIENT_AUTOCOMPLETE_LIMIT = 20
+
+# Отдавать список ингредиентов из справочника в памяти процесса.
+INGREDIENT_MEMORY_INDEX = True
+
+# Поиск ингредиентов по подстроке через триграммный индекс (pg_trgm).
+INGREDIENT_TRIGRAM_SEARCH = os.getenv('INGREDIENT_TRIGRAM_SEARCH', 'True') == 'True'
+
+# Сколько секунд хранится число записей для пагинации по фильтру.
+PAGINATION_COUNT_TIMEOUT = 60
+
+# Начиная с какого размера таблицы для списка без фильтров берётся
+# оценка планировщика (pg_class.reltuples) вместо COUNT(*).
+PAGINATION_ESTIMATE_MIN_ROWS = 10000
+
+# Сколько последних рецептов хранится в ленте подписок пользователя.
+FEED_MAX_ITEMS = 1000
+
+# Конфигурация полнотекстового поиска PostgreSQL для рецептов.
+SEARCH_CONFIG = 'russian'
+
+# Сколько рецептов по умолчанию возвращает подбор по ингредиентам.
+PANTRY_RESULTS_LIMIT = 20
+
+# Журнал изменённых рецептов для индекса подбора по продуктам: сколько
+# записей процесс догоняет точечно и сколько секунд записи хранятся.
+PANTRY_MAX_PENDING_CHANGES = 1000
+PANTRY_CHANGES_TIMEOUT = 24 * 60 * 60
+
+# Сколько похожих рецептов хранится для каждого рецепта.
+RECOMMENDATIONS_TOP_K = 20
+
+# Сколько кодов коротких ссылок держать в LRU-кэше процесса.
+SHORT_LINK_CACHE_SIZE = 10000
+
+# Как часто (в секундах) счётчики переходов сбрасываются в базу.
+SHORT_LINK_FLUSH_INTERVAL = 30
+
+# Сколько секунд браузеры и nginx могут кэшировать редирект.
+SHORT_LINK_MAX_AGE = 3600
+
+# Размеры (по длинной стороне) и форматы уменьшенных копий картинок
+# рецептов, которые генерирует фоновый воркер.
+IMAGE_VARIANT_SIZES = {'small': 320, 'medium': 640}
+IMAGE_VARIANT_FORMATS = ('webp', 'jpeg')
+
+# Ограничения на загружаемые картинки. Тело запроса не больше
+# client_max_body_size в nginx; картинка в base64 занимает на треть
+# больше, чем в файле.
+UPLOAD_MAX_BODY_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_SIZE = 7 * 1024 * 1024
+IMAGE_UPLOAD_MAX_DIMENSION = 6000
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+# Сколько секунд клиенты и прокси могут не перепроверять справочники
+# тегов и ингредиентов.
+REFERENCE_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Сколько секунд воркер держит задачу, прежде чем её заберёт другой
+# (если воркер упал), сколько секунд хранятся готовые результаты и как
+# часто воркер их удаляет.
+JOB_LEASE_TIMEOUT = 600
+JOB_RESULT_TTL = 7 * 24 * 60 * 60
+JOB_EXPIRE_INTERVAL = 60 * 60
+
+# Наибольшее число id в одном запросе массовых операций.
+BULK_MAX_ITEMS = 100
@@ -0,0 +1,5 @@
+def worker_exit(server, worker):
+    """Записывает накопленные переходы по коротким ссылкам."""
+    from recipes.short_links import hit_counter
+
+    hit_counter.flush()
@@ -0,0 +1,73 @@
+"""
+Денормализованные счётчики.
+
+Счётчик — колонка модели, равная числу связанных строк другой
+модели. Обычные пути (save/delete моделей) обновляют счётчики
+сигналами, массовые операции вызывают adjust() явно, а
+reconcile() пересчитывает колонки по фактическим данным.
+"""
+from collections import Counter, namedtuple
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorites, Recipe, ShoppingCart
+from users.models import Subscriptions, User
+
+CounterSpec = namedtuple("CounterSpec", "model field source foreign_key")
+
+COUNTERS = (
+    CounterSpec(Recipe, "favorites_count", Favorites, "recipe_id"),
+    CounterSpec(Recipe, "shopping_cart_count", ShoppingCart, "recipe_id"),
+    CounterSpec(User, "recipes_count", Recipe, "author_id"),
+    CounterSpec(User, "subscribers_count", Subscriptions, "author_id"),
+)
+
+
+def adjust(source, instances, sign):
+    """
+    Изменяет счётчики, зависящие от строк source, на sign за каждую
+    строку instances. Одним UPDATE на каждое значение изменения.
+    """
+    for spec in COUNTERS:
+        if spec.source is not source:
+            continue
+        deltas = Counter(
+            getattr(instance, spec.foreign_key) for instance in instances
+        )
+        by_delta = {}
+        for pk, count in deltas.items():
+            by_delta.setdefault(count * sign, []).append(pk)
+        for delta, pks in by_delta.items():
+            spec.model.objects.filter(pk__in=pks).update(
+                **{spec.field: F(spec.field) + delta}
+            )
+
+
+def actual_count(spec):
+    """Подзапрос с фактическим значением счётчика для строки."""
+    relation = spec.foreign_key[:-len("_id")]
+    return Coalesce(
+        Subquery(
+            spec.source.objects.filter(**{relation: OuterRef("pk")})
+            .order_by()
+            .values(relation)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def reconcile(spec):
+    """Исправляет расхождения счётчика, возвращает число исправлений."""
+    drifted = list(
+        spec.model.objects.annotate(actual=actual_count(spec))
+        .exclude(**{spec.field: F("actual")})
+        .values_list("pk", flat=True)
+    )
+    if drifted:
+        spec.model.objects.filter(pk__in=drifted).update(
+            **{spec.field: actual_count(spec)}
+        )
+    return len(drifted)
@@ -0,0 +1,101 @@
+"""
+Лента подписок с раздачей при записи (fan-out on write).
+
+Лента пользователя — строки FeedItem с рецептами авторов, на которых
+он подписан. Они добавляются при публикации рецепта (фоновой задачей
+feed_fan_out, чтобы запрос публикации не ждал раздачи по всем
+подписчикам) и при подписке, удаляются при отписке. В ленте хранится
+не больше FEED_MAX_ITEMS последних рецептов.
+"""
+from django.conf import settings
+from django.db.models import Count
+
+from recipes.models import FeedItem, Recipe
+from recipes.utils import limit_per_group
+from users.models import Subscriptions
+
+
+def feed_item(user_id, recipe):
+    return FeedItem(
+        user_id=user_id,
+        recipe_id=recipe.id,
+        author_id=recipe.author_id,
+        pub_date=recipe.pub_date,
+    )
+
+
+def trim(user_ids):
+    """Удаляет из лент user_ids рецепты сверх FEED_MAX_ITEMS."""
+    overflowed = list(
+        FeedItem.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values("user_id")
+        .annotate(total=Count("pk"))
+        .filter(total__gt=settings.FEED_MAX_ITEMS)
+        .values_list("user_id", flat=True)
+    )
+    if not overflowed:
+        return
+    kept = limit_per_group(
+        FeedItem.objects.filter(user_id__in=overflowed),
+        "user_id",
+        settings.FEED_MAX_ITEMS,
+    )
+    FeedItem.objects.filter(user_id__in=overflowed).exclude(
+        pk__in=kept.values("pk")
+    ).delete()
+
+
+def fan_out(recipe):
+    """Добавляет новый рецепт в ленты всех подписчиков автора."""
+    user_ids = list(
+        Subscriptions.objects.filter(author_id=recipe.author_id)
+        .values_list("user_id", flat=True)
+    )
+    if not user_ids:
+        return
+    FeedItem.objects.bulk_create(
+        (feed_item(user_id, recipe) for user_id in user_ids),
+        ignore_conflicts=True,
+    )
+    trim(user_ids)
+
+
+def run_fan_out(payload):
+    """Обработчик фоновой задачи раздачи опубликованного рецепта."""
+    recipe = (
+        Recipe.objects.filter(pk=payload["recipe"])
+        .only("id", "author_id", "pub_date")
+        .first()
+    )
+    if recipe is not None:
+        fan_out(recipe)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние рецепты автора после подписки."""
+    recipes = Recipe.objects.filter(author_id=author_id).only(
+        "id", "author_id", "pub_date"
+    )[:settings.FEED_MAX_ITEMS]
+    FeedItem.objects.bulk_create(
+        (feed_item(user_id, recipe) for recipe in recipes),
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def remove(user_id, author_id):
+    """Убирает из ленты рецепты автора после отписки."""
+    FeedItem.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_ids):
+    """Заново собирает ленты пользователей по текущим подпискам."""
+    FeedItem.objects.filter(user_id__in=user_ids).delete()
+    for user_id in user_ids:
+        recipes = Recipe.objects.filter(
+            author__subscribers__user_id=user_id
+        ).only("id", "author_id", "pub_date")[:settings.FEED_MAX_ITEMS]
+        FeedItem.objects.bulk_create(
+            feed_item(user_id, recipe) for recipe in recipes
+        )
@@ -0,0 +1,64 @@
+from bisect import bisect_left
+
+from recipes.models import Ingredient
+from recipes.snapshots import VersionedSnapshot
+
+
+class IngredientIndex:
+    """
+    Справочник ингредиентов в памяти процесса.
+
+    Хранит отображение id → (название, единица измерения) и
+    отсортированный список названий для поиска по префиксу
+    бинарным поиском.
+    """
+
+    def __init__(self, rows):
+        self.items = {}
+        entries = []
+        for ingredient_id, name, unit in rows:
+            self.items[ingredient_id] = (name, unit)
+            entries.append((name.casefold(), ingredient_id))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ids = [ingredient_id for _, ingredient_id in entries]
+
+    def get(self, ingredient_id):
+        return self.items.get(ingredient_id)
+
+    def as_dict(self, ingredient_id):
+        name, unit = self.items[ingredient_id]
+        return {"id": ingredient_id, "name": name, "measurement_unit": unit}
+
+    def prefix(self, value):
+        value = value.casefold()
+        position = bisect_left(self.keys, value)
+        result = []
+        while (
+            position < len(self.keys)
+            and self.keys[position].startswith(value)
+        ):
+            result.append(self.ids[position])
+            position += 1
+        return result
+
+    def search(self, value, limit, contains=True):
+        """Сначала совпадения по префиксу, затем по подстроке."""
+        result = self.prefix(value)[:limit]
+        if contains and len(result) < limit:
+            value = value.casefold()
+            found = set(result)
+            for key, ingredient_id in zip(self.keys, self.ids):
+                if value in key and ingredient_id not in found:
+                    result.append(ingredient_id)
+                    if len(result) == limit:
+                        break
+        return result
+
+
+ingredient_index = VersionedSnapshot(
+    "ingredients",
+    lambda: IngredientIndex(
+        Ingredient.objects.values_list("id", "name", "measurement_unit")
+    ),
+)
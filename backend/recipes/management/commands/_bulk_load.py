@@ -0,0 +1,120 @@
+import csv
+import io
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+DATA_DIR = settings.BASE_DIR.parent / "data"
+BATCH_SIZE = 1000
+
+
+class BulkLoadCommand(BaseCommand):
+    """
+    Базовая команда массовой загрузки справочника из CSV или JSON.
+
+    Файл читается потоково, строки с повторяющимися уникальными
+    полями отбрасываются. На PostgreSQL данные загружаются через COPY
+    во временную таблицу и переносятся одним INSERT ... ON CONFLICT
+    DO NOTHING, на других СУБД — пакетным bulk_create. Повторный
+    запуск не создаёт дубликатов.
+    """
+
+    model = None
+    fields = ()
+    unique_fields = ()
+    default_file = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=str(DATA_DIR / self.default_file),
+            help="Путь к файлу .csv или .json.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"Файл {path} не найден.")
+        started = time.perf_counter()
+        with transaction.atomic():
+            before = self.model.objects.count()
+            read = self.load(self.unique(self.read(path)))
+            created = self.model.objects.count() - before
+            self.after_load()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Прочитано строк: {read}, добавлено: {created}, "
+            f"время: {elapsed:.3f} с, {read / elapsed:.0f} строк/с."
+        )
+
+    def read(self, path):
+        with open(path, encoding="utf-8") as file:
+            if path.suffix == ".json":
+                for item in json.load(file):
+                    yield tuple(item[field] for field in self.fields)
+            else:
+                for row in csv.reader(file):
+                    if row:
+                        yield tuple(row[:len(self.fields)])
+
+    def unique(self, rows):
+        positions = [self.fields.index(field) for field in self.unique_fields]
+        seen = [set() for _ in positions]
+        for row in rows:
+            values = [row[position] for position in positions]
+            if any(value in known for value, known in zip(values, seen)):
+                continue
+            for value, known in zip(values, seen):
+                known.add(value)
+            yield row
+
+    def load(self, rows):
+        if connection.vendor == "postgresql":
+            return self.copy(rows)
+        read = 0
+        batch = []
+        for row in rows:
+            batch.append(self.model(**dict(zip(self.fields, row))))
+            if len(batch) == BATCH_SIZE:
+                read += self.insert(batch)
+                batch = []
+        return read + self.insert(batch)
+
+    def insert(self, batch):
+        self.model.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch)
+
+    def copy(self, rows):
+        table = self.model._meta.db_table
+        columns = ", ".join(
+            self.model._meta.get_field(field).column for field in self.fields
+        )
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        read = 0
+        for row in rows:
+            writer.writerow(row)
+            read += 1
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE load_{table} ON COMMIT DROP AS "
+                f"SELECT {columns} FROM {table} WITH NO DATA"
+            )
+            cursor.copy_expert(
+                f"COPY load_{table} ({columns}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) "
+                f"SELECT {columns} FROM load_{table} ON CONFLICT DO NOTHING"
+            )
+        return read
+
+    def after_load(self):
+        """Вызывается после загрузки внутри той же транзакции."""
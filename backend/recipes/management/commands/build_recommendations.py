@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.recommendations import benchmark, build
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает похожие рецепты по совместным добавлениям "
+        "в избранное. Запускается периодически, например из cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=settings.RECOMMENDATIONS_TOP_K,
+            help="Сколько похожих рецептов хранить для каждого рецепта.",
+        )
+        parser.add_argument(
+            "--benchmark",
+            nargs="?",
+            const="100000,1000000,3000000",
+            help=(
+                "Не трогать базу, а замерить расчёт на синтетическом "
+                "избранном указанных размеров (через запятую)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options["benchmark"]:
+            sizes = [int(size) for size in options["benchmark"].split(",")]
+            self.stdout.write("строк избранного\tсекунд\tпар")
+            for rows, seconds, pairs in benchmark(sizes, options["top_k"]):
+                self.stdout.write(f"{rows}\t{seconds:.2f}\t{pairs}")
+            return
+        pairs, timings = build(options["top_k"])
+        self.stdout.write(
+            f"Сохранено пар: {pairs}; "
+            + ", ".join(
+                f"{stage} {seconds:.2f} с"
+                for stage, seconds in timings.items()
+            )
+        )
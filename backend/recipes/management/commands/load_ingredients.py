@@ -0,0 +1,15 @@
+from recipes.ingredient_index import ingredient_index
+from recipes.management.commands._bulk_load import BulkLoadCommand
+from recipes.models import Ingredient
+
+
+class Command(BulkLoadCommand):
+    help = "Загружает ингредиенты из data/ingredients.csv или .json."
+
+    model = Ingredient
+    fields = ("name", "measurement_unit")
+    unique_fields = ("name",)
+    default_file = "ingredients.csv"
+
+    def after_load(self):
+        ingredient_index.invalidate()
@@ -0,0 +1,11 @@
+from recipes.management.commands._bulk_load import BulkLoadCommand
+from recipes.models import Tag
+
+
+class Command(BulkLoadCommand):
+    help = "Загружает теги из data/tags.json или .csv."
+
+    model = Tag
+    fields = ("name", "slug")
+    unique_fields = ("name", "slug")
+    default_file = "tags.json"
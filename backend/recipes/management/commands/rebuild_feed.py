@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.feed import rebuild
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Заново собирает ленты подписок пользователей."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "users",
+            nargs="*",
+            type=int,
+            help="id пользователей; по умолчанию все, у кого есть подписки.",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["users"] or list(
+            User.objects.filter(subscriptions__isnull=False)
+            .distinct()
+            .values_list("id", flat=True)
+        )
+        with transaction.atomic():
+            rebuild(user_ids)
+        self.stdout.write(f"Собрано лент: {len(user_ids)}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import COUNTERS, reconcile
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает денормализованные счётчики и исправляет расхождения."
+
+    def handle(self, *args, **options):
+        for spec in COUNTERS:
+            with transaction.atomic():
+                fixed = reconcile(spec)
+            self.stdout.write(
+                f"{spec.model._meta.label}.{spec.field}: "
+                f"исправлено {fixed}"
+            )
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import update_search_vectors
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает поисковые векторы рецептов пачками."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Количество рецептов в одном UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        ids = list(Recipe.objects.order_by("id").values_list("id", flat=True))
+        size = options["batch_size"]
+        for start in range(0, len(ids), size):
+            with transaction.atomic():
+                update_search_vectors(ids[start:start + size])
+        self.stdout.write(f"Обновлено рецептов: {len(ids)}")
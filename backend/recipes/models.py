@@ -1,7 +1,9 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from shortener.models import UrlMap
 
+from recipes.storage import ContentAddressedStorage
 from users.models import User
 from recipes.constants import (
     MAX_NAME_LENGTH,
@@ -80,10 +82,17 @@ class Recipe(models.Model):
 
     image = models.ImageField(
         upload_to="recipes/",
+        storage=ContentAddressedStorage(),
         verbose_name="Картинка рецепта",
         help_text="Загрузите изображение рецепта",
     )
 
+    image_variants_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Уменьшенные копии картинки готовы",
+    )
+
     text = models.TextField(
         verbose_name="Описание рецепта",
         help_text="Введите описание рецепта",
@@ -128,10 +137,39 @@ class Recipe(models.Model):
         blank=True
     )
 
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="В избранном",
+    )
+
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="В списках покупок",
+    )
+
+    short_link_hits = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Переходов по короткой ссылке",
+    )
+
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name="Поисковый вектор",
+    )
+
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
-        ordering = ["-pub_date"]
+        ordering = ["-pub_date", "-id"]
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="recipe_pub_date_id_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -243,3 +281,97 @@ class AmountIngredient(models.Model):
 
     def __str__(self):
         return f"{self.amount} {self.ingredients}"
+
+
+class FeedItem(models.Model):
+    """
+    Рецепт в ленте подписок пользователя.
+
+    Строки создаются при публикации рецепта для каждого подписчика
+    автора и при подписке на автора, поэтому лента читается одним
+    диапазоном индекса (user, -pub_date, -recipe).
+    """
+
+    user = models.ForeignKey(
+        verbose_name="Читатель ленты",
+        related_name="feed",
+        to=User,
+        on_delete=models.CASCADE,
+    )
+    recipe = models.ForeignKey(
+        verbose_name="Рецепт",
+        related_name="feed_items",
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        verbose_name="Автор рецепта",
+        related_name="+",
+        to=User,
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        verbose_name = "Рецепт в ленте"
+        verbose_name_plural = "Лента подписок"
+        ordering = ["-pub_date", "-recipe_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_feed_item"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-recipe"],
+                name="feed_user_pub_date_idx",
+            ),
+            models.Index(
+                fields=["user", "author"], name="feed_user_author_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.recipe}"
+
+
+class RecipeSimilarity(models.Model):
+    """
+    Похожий рецепт.
+
+    Таблица заполняется командой build_recommendations: для каждого
+    рецепта хранится top-K рецептов, которые чаще всего добавляют в
+    избранное вместе с ним.
+    """
+
+    recipe = models.ForeignKey(
+        verbose_name="Рецепт",
+        related_name="similarities",
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    similar = models.ForeignKey(
+        verbose_name="Похожий рецепт",
+        related_name="+",
+        to=Recipe,
+        on_delete=models.CASCADE,
+    )
+    score = models.FloatField(verbose_name="Сходство")
+
+    class Meta:
+        verbose_name = "Похожий рецепт"
+        verbose_name_plural = "Похожие рецепты"
+        ordering = ["recipe", "-score"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "similar"], name="unique_recipe_similarity"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["recipe", "-score"], name="similarity_recipe_score_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} ~ {self.similar}"
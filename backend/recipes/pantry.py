@@ -0,0 +1,195 @@
+"""
+Подбор рецептов по имеющимся ингредиентам.
+
+Индекс в памяти процесса строится одним проходом по AmountIngredient:
+для каждого ингредиента хранится компактный массив id рецептов, для
+каждого рецепта — его ингредиенты. Запрос обходит только списки
+рецептов выбранных ингредиентов, а не весь каталог.
+
+После первой сборки индекс не перестраивается целиком при каждом
+изменении. Изменённые за транзакцию рецепты записываются после коммита
+одной записью в журнал в общем кэше, и каждый процесс при следующем
+обращении перечитывает из базы ингредиенты только этих рецептов.
+Полная сборка нужна, лишь если журнал потерян (вытеснен из кэша или
+кэш очищен) или отстал больше чем на PANTRY_MAX_PENDING_CHANGES записей.
+"""
+import heapq
+import threading
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from recipes.models import AmountIngredient
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент → рецепты."""
+
+    def __init__(self, rows):
+        postings = defaultdict(lambda: array("q"))
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self.postings = dict(postings)
+        self.recipes = {
+            recipe_id: tuple(ingredient_ids)
+            for recipe_id, ingredient_ids in recipes.items()
+        }
+
+    def refresh(self, recipe_ids, rows):
+        """
+        Заменяет ингредиенты рецептов recipe_ids строками rows.
+
+        Рецепты без строк удаляются из индекса. Изменённые списки
+        рецептов собираются заново и подменяются целиком, поэтому
+        параллельный match() не видит их в промежуточном состоянии.
+        """
+        current = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            current[recipe_id].append(ingredient_id)
+        removed = defaultdict(set)
+        added = defaultdict(list)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.recipes.pop(recipe_id, ()):
+                removed[ingredient_id].add(recipe_id)
+            if recipe_id in current:
+                self.recipes[recipe_id] = tuple(current[recipe_id])
+                for ingredient_id in current[recipe_id]:
+                    added[ingredient_id].append(recipe_id)
+        for ingredient_id in removed.keys() | added.keys():
+            recipes = array(
+                "q",
+                (
+                    recipe_id
+                    for recipe_id in self.postings.get(ingredient_id, ())
+                    if recipe_id not in removed[ingredient_id]
+                ),
+            )
+            recipes.extend(added[ingredient_id])
+            if recipes:
+                self.postings[ingredient_id] = recipes
+            else:
+                self.postings.pop(ingredient_id, None)
+
+    def match(self, ingredient_ids, limit, max_missing=None):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов.
+
+        Возвращает до limit кортежей (recipe_id, missing, coverage),
+        где missing — сколько ингредиентов рецепта не хватает, а
+        coverage — доля имеющихся. Сначала рецепты с меньшим числом
+        недостающих ингредиентов, затем с большим покрытием и новые.
+        """
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(self.postings.get(ingredient_id, ()))
+        candidates = (
+            (len(self.recipes[recipe_id]) - count, count, recipe_id)
+            for recipe_id, count in matched.items()
+            if recipe_id in self.recipes
+        )
+        if max_missing is not None:
+            candidates = (
+                candidate for candidate in candidates
+                if candidate[0] <= max_missing
+            )
+        best = heapq.nsmallest(
+            limit,
+            candidates,
+            key=lambda item: (
+                item[0], -item[1] / (item[0] + item[1]), -item[2]
+            ),
+        )
+        return [
+            (recipe_id, missing, count / (missing + count))
+            for missing, count, recipe_id in best
+        ]
+
+
+def index_rows(recipe_ids=None):
+    queryset = AmountIngredient.objects.all()
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    return queryset.values_list("recipe_id", "ingredients_id").iterator()
+
+
+class PantrySnapshot:
+    """Индекс в памяти процесса, догоняющий журнал изменённых рецептов."""
+
+    sequence_key = "pantry:sequence"
+
+    def __init__(self):
+        self._index = None
+        self._sequence = None
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    @staticmethod
+    def entry_key(sequence):
+        return f"pantry:changes:{sequence}"
+
+    def current_sequence(self):
+        cache.add(self.sequence_key, 0, None)
+        return cache.get(self.sequence_key, 0)
+
+    def get(self):
+        sequence = self.current_sequence()
+        if sequence != self._sequence:
+            with self._lock:
+                if sequence != self._sequence:
+                    self.catch_up(sequence)
+        return self._index
+
+    def catch_up(self, sequence):
+        behind = sequence - (self._sequence or 0)
+        if (
+            self._index is None
+            or behind < 0
+            or behind > settings.PANTRY_MAX_PENDING_CHANGES
+        ):
+            self.rebuild(sequence)
+            return
+        keys = [
+            self.entry_key(number)
+            for number in range(self._sequence + 1, sequence + 1)
+        ]
+        entries = cache.get_many(keys)
+        if len(entries) < len(keys):
+            self.rebuild(sequence)
+            return
+        recipe_ids = set().union(*entries.values())
+        self._index.refresh(recipe_ids, index_rows(recipe_ids))
+        self._sequence = sequence
+
+    def rebuild(self, sequence):
+        self._index = PantryIndex(index_rows())
+        self._sequence = sequence
+
+    def changed(self, recipe_ids):
+        """
+        Отмечает рецепты изменёнными.
+
+        Все рецепты, отмеченные до коммита транзакции, попадают в журнал
+        одной записью, сколько бы строк ингредиентов ни изменилось.
+        """
+        self._pending.update(recipe_ids)
+        transaction.on_commit(self.publish)
+
+    def publish(self):
+        if not self._pending:
+            return
+        recipe_ids, self._pending = self._pending, set()
+        cache.add(self.sequence_key, 0, None)
+        sequence = cache.incr(self.sequence_key)
+        cache.set(
+            self.entry_key(sequence),
+            recipe_ids,
+            settings.PANTRY_CHANGES_TIMEOUT,
+        )
+
+
+pantry_index = PantrySnapshot()
@@ -0,0 +1,196 @@
+"""
+Полнотекстовый поиск рецептов.
+
+На PostgreSQL поиск идёт по хранимому полю Recipe.search_vector с
+GIN-индексом: вектор собирается из названия (вес A), ингредиентов
+(вес B) и описания (вес C) и обновляется при изменении рецепта.
+На других СУБД (SQLite в тестах и разработке) используется
+инвертированный индекс в памяти процесса с тем же порядком весов.
+"""
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+)
+from django.db import connections, transaction
+from django.db.models import (
+    Case,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+
+from recipes.models import AmountIngredient, Recipe
+from recipes.snapshots import VersionedSnapshot
+
+WEIGHTS = {"A": 1.0, "B": 0.4, "C": 0.1}
+TOKEN = re.compile(r"\w+")
+
+
+def uses_database_search(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def tokenize(text):
+    return TOKEN.findall(text.casefold())
+
+
+def search_vector():
+    """Выражение вектора рецепта для UPDATE."""
+    ingredient_names = Subquery(
+        AmountIngredient.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+        .annotate(names=StringAgg("ingredients__name", " "))
+        .values("names")
+    )
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector("name", weight="A", config=config)
+        + SearchVector(
+            Coalesce(ingredient_names, Value("")), weight="B", config=config
+        )
+        + SearchVector("text", weight="C", config=config)
+    )
+
+
+def update_search_vectors(recipe_ids=None):
+    """Пересчитывает search_vector рецептов (всех, если ids не заданы)."""
+    if uses_database_search():
+        queryset = Recipe.objects.all()
+        if recipe_ids is not None:
+            queryset = queryset.filter(pk__in=list(recipe_ids))
+        queryset.update(search_vector=search_vector())
+    else:
+        recipe_search_index.invalidate()
+
+
+_pending = set()
+
+
+def search_vectors_changed(recipe_ids):
+    """
+    Отмечает рецепты, векторы которых нужно пересчитать.
+
+    Пересчёт выполняется одним UPDATE после коммита транзакции, сколько
+    бы раз за неё ни менялись рецепт и его ингредиенты. Индекс в памяти
+    сбрасывается сразу: версия снимка и так меняется после коммита.
+    """
+    if not uses_database_search():
+        recipe_search_index.invalidate()
+        return
+    _pending.update(recipe_ids)
+    transaction.on_commit(flush_search_vectors)
+
+
+def flush_search_vectors():
+    recipe_ids = set(_pending)
+    _pending.difference_update(recipe_ids)
+    if recipe_ids:
+        update_search_vectors(recipe_ids)
+
+
+class RecipeSearchIndex:
+    """
+    Инвертированный индекс рецептов в памяти процесса.
+
+    Для каждого слова хранится вес вхождения в каждый рецепт. Слова
+    запроса сопоставляются по префиксу, поэтому «картоф» находит
+    «картофель»; рецепт должен содержать все слова запроса.
+    """
+
+    def __init__(self, recipes, ingredients):
+        postings = defaultdict(lambda: defaultdict(float))
+        for recipe_id, name, text in recipes:
+            self.add(postings, recipe_id, name, WEIGHTS["A"])
+            self.add(postings, recipe_id, text, WEIGHTS["C"])
+        for recipe_id, name in ingredients:
+            self.add(postings, recipe_id, name, WEIGHTS["B"])
+        self.tokens = sorted(postings)
+        self.postings = {
+            token: dict(weights) for token, weights in postings.items()
+        }
+
+    @staticmethod
+    def add(postings, recipe_id, text, weight):
+        for token in tokenize(text):
+            postings[token][recipe_id] += weight
+
+    def matches(self, term):
+        scores = defaultdict(float)
+        position = bisect_left(self.tokens, term)
+        while (
+            position < len(self.tokens)
+            and self.tokens[position].startswith(term)
+        ):
+            for recipe_id, weight in self.postings[
+                self.tokens[position]
+            ].items():
+                scores[recipe_id] += weight
+            position += 1
+        return scores
+
+    def search(self, value):
+        """Релевантность рецептов, содержащих все слова запроса."""
+        scores = None
+        for term in tokenize(value):
+            found = self.matches(term)
+            if scores is None:
+                scores = found
+            else:
+                scores = {
+                    recipe_id: score + found[recipe_id]
+                    for recipe_id, score in scores.items()
+                    if recipe_id in found
+                }
+        return dict(scores or {})
+
+
+recipe_search_index = VersionedSnapshot(
+    "recipe-search",
+    lambda: RecipeSearchIndex(
+        Recipe.objects.values_list("id", "name", "text").iterator(),
+        AmountIngredient.objects.values_list(
+            "recipe_id", "ingredients__name"
+        ).iterator(),
+    ),
+)
+
+
+def search_recipes(queryset, value):
+    """Фильтрует queryset по запросу и сортирует по релевантности."""
+    if uses_database_search(queryset.db):
+        query = SearchQuery(
+            value, config=settings.SEARCH_CONFIG, search_type="websearch"
+        )
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=SearchRank(F("search_vector"), query))
+            .order_by("-rank", "-pub_date", "-id")
+        )
+    scores = recipe_search_index.get().search(value)
+    # Различных значений релевантности немного, поэтому рецепты
+    # группируются по ней: одно условие CASE на группу, а не на рецепт.
+    groups = defaultdict(list)
+    for recipe_id, score in scores.items():
+        groups[round(score, 6)].append(recipe_id)
+    return queryset.filter(pk__in=list(scores)).annotate(
+        rank=Case(
+            *(
+                When(pk__in=ids, then=Value(score))
+                for score, ids in groups.items()
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    ).order_by("-rank", "-pub_date", "-id")
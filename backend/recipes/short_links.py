@@ -0,0 +1,201 @@
+"""
+Короткие ссылки на рецепты.
+
+Код ссылки — id рецепта в системе счисления по основанию 62, поэтому
+он вычисляется без обращения к базе и не требует отдельной таблицы.
+Ссылки, созданные раньше через django-link-shortener, хранятся в
+UrlMap и продолжают работать.
+"""
+import atexit
+import logging
+import os
+import string
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import F, Q
+
+from recipes.models import Recipe
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+
+logger = logging.getLogger(__name__)
+
+
+def encode(recipe_id):
+    code = ""
+    while True:
+        recipe_id, digit = divmod(recipe_id, BASE)
+        code = ALPHABET[digit] + code
+        if not recipe_id:
+            return code
+
+
+def decode(code):
+    """id рецепта по коду или None, если код некорректен."""
+    recipe_id = 0
+    for char in code:
+        digit = ALPHABET.find(char)
+        if digit < 0:
+            return None
+        recipe_id = recipe_id * BASE + digit
+    return recipe_id if code and encode(recipe_id) == code else None
+
+
+def short_code(recipe):
+    if recipe.short_link_id is not None:
+        return recipe.short_link.short_url
+    return encode(recipe.id)
+
+
+def resolve(code):
+    """
+    id существующего рецепта по коду короткой ссылки или None.
+
+    Код ищется среди старых ссылок UrlMap (уникальный индекс
+    short_url) и как декодированный id — одним запросом; старая
+    ссылка важнее.
+    """
+    recipe_id = decode(code)
+    lookup = Q(short_link__short_url=code)
+    if recipe_id is not None:
+        lookup |= Q(pk=recipe_id)
+    found = dict(
+        Recipe.objects.filter(lookup).values_list(
+            "short_link__short_url", "id"
+        )
+    )
+    if code in found:
+        return found[code]
+    return recipe_id if recipe_id in found.values() else None
+
+
+class ResolvedCodes:
+    """
+    LRU-кэш процесса: код короткой ссылки → id рецепта.
+
+    Хранятся только коды существующих рецептов: промахи не кэшируются,
+    потому что код может появиться позже. При удалении рецепта его коды
+    убираются сигналом, а в других процессах — при сбросе счётчика
+    переходов, который замечает, что рецепта больше нет.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, code):
+        with self.lock:
+            recipe_id = self.entries.get(code)
+            if recipe_id is not None:
+                self.entries.move_to_end(code)
+            return recipe_id
+
+    def put(self, code, recipe_id):
+        with self.lock:
+            self.entries[code] = recipe_id
+            self.entries.move_to_end(code)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def forget(self, recipe_ids):
+        recipe_ids = set(recipe_ids)
+        with self.lock:
+            stale = [
+                code for code, recipe_id in self.entries.items()
+                if recipe_id in recipe_ids
+            ]
+            for code in stale:
+                del self.entries[code]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+resolved_codes = ResolvedCodes(settings.SHORT_LINK_CACHE_SIZE)
+
+
+def resolve_cached(code):
+    """id рецепта по коду через LRU-кэш процесса или None."""
+    recipe_id = resolved_codes.get(code)
+    if recipe_id is None:
+        recipe_id = resolve(code)
+        if recipe_id is not None:
+            resolved_codes.put(code, recipe_id)
+    return recipe_id
+
+
+class HitCounter:
+    """
+    Счётчик переходов по коротким ссылкам.
+
+    Переходы копятся в памяти процесса и раз в
+    SHORT_LINK_FLUSH_INTERVAL секунд записываются в
+    Recipe.short_link_hits фоновым потоком — по одному UPDATE на каждое
+    значение прироста, а не на каждый переход. При завершении процесса
+    (atexit, хук worker_exit в gunicorn.conf.py) остаток сбрасывается.
+    """
+
+    def __init__(self):
+        self.hits = Counter()
+        self.lock = threading.Lock()
+        self.thread_pid = None
+        atexit.register(self.flush)
+
+    def hit(self, recipe_id):
+        self.start()
+        with self.lock:
+            self.hits[recipe_id] += 1
+
+    def start(self):
+        """Запускает поток сброса, один на процесс (в том числе после fork)."""
+        if self.thread_pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread_pid == os.getpid():
+                return
+            self.thread_pid = os.getpid()
+        threading.Thread(
+            target=self.run, name="short-link-hits", daemon=True
+        ).start()
+
+    def run(self):
+        while True:
+            time.sleep(settings.SHORT_LINK_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def flush(self):
+        with self.lock:
+            hits, self.hits = self.hits, Counter()
+        by_count = {}
+        for recipe_id, count in hits.items():
+            by_count.setdefault(count, []).append(recipe_id)
+        try:
+            for count, recipe_ids in by_count.items():
+                updated = Recipe.objects.filter(pk__in=recipe_ids).update(
+                    short_link_hits=F("short_link_hits") + count
+                )
+                if updated < len(recipe_ids):
+                    # Рецепт удалён, пока код лежал в кэше процесса.
+                    existing = Recipe.objects.filter(
+                        pk__in=recipe_ids
+                    ).values_list("id", flat=True)
+                    resolved_codes.forget(set(recipe_ids) - set(existing))
+                for recipe_id in recipe_ids:
+                    del hits[recipe_id]
+        except DatabaseError:
+            logger.exception("Не удалось записать переходы по ссылкам")
+            with self.lock:
+                self.hits.update(hits)
+
+
+hit_counter = HitCounter()
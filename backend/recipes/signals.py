@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from recipes import counters, feed
+from recipes.ingredient_index import ingredient_index
+from recipes.pantry import pantry_index
+from recipes.models import (
+    AmountIngredient,
+    Favorites,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+)
+from recipes.search import (
+    recipe_search_index,
+    search_vectors_changed,
+    uses_database_search,
+)
+from recipes.short_links import resolved_codes
+from users.models import Subscriptions
+
+POSTGRES_INDEXES = (
+    # UPPER(name::text) совпадает с выражением, которое Django строит
+    # для istartswith/icontains, поэтому индекс используется для LIKE.
+    "CREATE INDEX IF NOT EXISTS recipes_ingredient_name_upper_like "
+    "ON recipes_ingredient (UPPER(name::text) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector "
+    "ON recipes_recipe USING gin (search_vector)",
+)
+TRIGRAM_INDEXES = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm "
+    "ON recipes_ingredient USING gin (UPPER(name::text) gin_trgm_ops)",
+)
+
+
+def create_postgres_indexes(sender, using, **kwargs):
+    """
+    Создаёт индексы, которые нельзя описать переносимо в Meta моделей.
+
+    Выполняется после migrate только на PostgreSQL; на других СУБД
+    поиск работает без этих индексов.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    statements = POSTGRES_INDEXES
+    if settings.INGREDIENT_TRIGRAM_SEARCH:
+        statements += TRIGRAM_INDEXES
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscriptions)
+def counted_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust(sender, [instance], 1)
+
+
+@receiver(post_delete, sender=Favorites)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscriptions)
+def counted_deleted(sender, instance, **kwargs):
+    counters.adjust(sender, [instance], -1)
+
+
+@receiver(post_save, sender=Subscriptions)
+def subscribed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def unsubscribed(sender, instance, **kwargs):
+    feed.remove(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_changed(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    if raw or (update_fields and not {"name", "text"} & set(update_fields)):
+        return
+    search_vectors_changed([instance.pk])
+
+
+@receiver(post_save, sender=AmountIngredient)
+@receiver(post_delete, sender=AmountIngredient)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    search_vectors_changed([instance.recipe_id])
+    pantry_index.changed([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_ingredients_set(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        pantry_index.changed([instance.pk])
+    elif pk_set:
+        pantry_index.changed(pk_set)
+    else:
+        pantry_index.changed(
+            instance.ingredient_recipes.values_list("recipe_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_renamed(sender, instance, created, **kwargs):
+    if not created:
+        search_vectors_changed(
+            instance.ingredient_recipes.values_list("recipe_id", flat=True)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_removed_from_indexes(sender, instance, **kwargs):
+    pantry_index.changed([instance.pk])
+    resolved_codes.forget([instance.pk])
+    if not uses_database_search():
+        recipe_search_index.invalidate()
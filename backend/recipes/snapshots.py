@@ -0,0 +1,90 @@
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def new_version():
+    """
+    Новый токен версии: время создания и случайная часть.
+
+    Токен — случайное значение, а не счётчик: если ключ вытеснен из
+    кэша, новый токен гарантированно не совпадёт со старыми данными.
+    Время в начале токена служит отметкой последнего изменения.
+    """
+    return f"{time.time():.6f}-{uuid4().hex}"
+
+
+def version_time(version):
+    """Время создания токена версии или None для токена без времени."""
+    try:
+        return float(version.split("-", 1)[0])
+    except ValueError:
+        return None
+
+
+def get_versions(keys):
+    """Текущие версии для набора ключей в общем кэше Django."""
+    versions = cache.get_many(keys)
+    missing = {key: new_version() for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        versions.update(cache.get_many(list(missing)))
+    return versions
+
+
+def get_version(key):
+    return get_versions([key])[key]
+
+
+def bump_versions(keys):
+    """Меняет версии после коммита текущей транзакции."""
+    keys = list(keys)
+    if keys:
+        transaction.on_commit(
+            lambda: cache.set_many({key: new_version() for key in keys}, None)
+        )
+
+
+class VersionedSnapshot:
+    """
+    Неизменяемый снимок данных в памяти процесса.
+
+    Снимок строится при первом обращении и перестраивается, когда
+    меняется его версия. Версия хранится в кэше Django, поэтому
+    инвалидация в одном процессе видна всем процессам, только если
+    кэш общий (memcached), а не локальный для процесса. На случай
+    локального кэша снимок перестраивается и по возрасту, не реже
+    раза в SNAPSHOT_MAX_AGE секунд.
+    """
+
+    def __init__(self, name, build):
+        self.key = f"snapshot-version:{name}"
+        self.build = build
+        self._version = None
+        self._data = None
+        self._built = 0
+        self._lock = threading.Lock()
+
+    def is_fresh(self, version):
+        return version == self._version and (
+            time.monotonic() - self._built < settings.SNAPSHOT_MAX_AGE
+        )
+
+    def get(self):
+        version = get_version(self.key)
+        if not self.is_fresh(version):
+            with self._lock:
+                if not self.is_fresh(version):
+                    self._data = self.build()
+                    self._version = version
+                    self._built = time.monotonic()
+        return self._data
+
+    def invalidate(self):
+        """Сбрасывает снимок во всех процессах после коммита транзакции."""
+        bump_versions([self.key])
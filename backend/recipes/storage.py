@@ -0,0 +1,36 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, в котором имя файла — хеш его содержимого.
+
+    Файл сохраняется как <каталог>/<2 символа хеша>/<sha256><расширение>,
+    где каталог задаёт upload_to поля. Повторная загрузка того же
+    содержимого не создаёт копию, а возвращает имя уже сохранённого
+    файла.
+    """
+
+    def content_name(self, name, content):
+        """Имя, под которым будет сохранено содержимое content."""
+        digest = hashlib.sha256()
+        if hasattr(content, "seek"):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        hexdigest = digest.hexdigest()
+        return os.path.join(
+            directory, hexdigest[:2], f"{hexdigest}{extension}"
+        )
+
+    def save(self, name, content, max_length=None):
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,37 @@
+from django.db.models import F, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+
+def limit_per_group(queryset, partition_by, limit):
+    """
+    Оставляет не больше limit строк в каждой группе partition_by.
+
+    Строки нумеруются оконной функцией ROW_NUMBER() OVER (PARTITION BY
+    ...) в порядке сортировки queryset, отбор по номеру делается в SQL.
+    Django 3.2 не умеет фильтровать по оконным функциям, поэтому
+    нумерованный запрос оборачивается в подзапрос через RawSQL.
+    Фильтр накладывается на исходный queryset, поэтому его only(),
+    аннотации и select_related сохраняются.
+    """
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    ranked = queryset.annotate(
+        position=Window(
+            expression=RowNumber(),
+            partition_by=[F(partition_by)],
+            order_by=[
+                F(field[1:]).desc() if field.startswith("-")
+                else F(field).asc()
+                for field in ordering
+            ],
+        )
+    ).order_by().values("pk", "position")
+    sql, params = ranked.query.sql_with_params()
+    pk = queryset.model._meta.pk.column
+    return queryset.filter(
+        pk__in=RawSQL(
+            f'SELECT ranked."{pk}" FROM ({sql}) ranked '
+            'WHERE ranked."position" <= %s',
+            (*params, limit),
+        )
+    ).order_by(*ordering)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import redirect
+from django.utils.cache import patch_cache_control
+
+from recipes.short_links import hit_counter, resolve_cached
+
+
+def short_link_redirect(request, code):
+    """
+    Переход по короткой ссылке на страницу рецепта.
+
+    Код разрешается через LRU-кэш процесса, переход учитывается в
+    счётчике в памяти. Редирект можно кэшировать в nginx и браузере.
+    """
+    recipe_id = resolve_cached(code)
+    if recipe_id is None:
+        raise Http404
+    hit_counter.hit(recipe_id)
+    response = redirect(f"/recipes/{recipe_id}/")
+    patch_cache_control(
+        response, public=True, max_age=settings.SHORT_LINK_MAX_AGE
+    )
+    return response
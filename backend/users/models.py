@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.contrib.auth.validators import UnicodeUsernameValidator
 
+from recipes.storage import ContentAddressedStorage
 from .constants import (
     MAX_USERNAME_LENGTH,
     MAX_EMAIL_LENGTH,
@@ -43,6 +44,7 @@ class UserProfile(AbstractUser):
 
     avatar = models.ImageField(
         upload_to="users/",
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         verbose_name="Аватар пользователя",
@@ -55,6 +57,18 @@ class UserProfile(AbstractUser):
         help_text="Напишите пароль",
     )
 
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество рецептов",
+    )
+
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Количество подписчиков",
+    )
+
     class Meta:
         ordering = ("username",)
         verbose_name = "Пользователь"
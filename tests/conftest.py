@@ -0,0 +1,202 @@
+import base64
+import io
+import json
+import os
+import random
+from types import SimpleNamespace
+
+import pytest
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes import feed, recommendations
+from recipes.counters import COUNTERS, reconcile
+from recipes.models import (
+    AmountIngredient,
+    Favorites,
+    Ingredient,
+    Recipe,
+    ShoppingCart,
+    Tag,
+)
+from users.models import Subscriptions, User
+
+SEED_SCALE = float(os.getenv("FOODGRAM_SEED_SCALE", "1"))
+SEED_PASSWORD = "Seed-password-123"
+INGREDIENTS_FILE = settings.BASE_DIR.parent / "data" / "ingredients.json"
+TAGS = (
+    ("Завтрак", "breakfast"),
+    ("Обед", "lunch"),
+    ("Ужин", "dinner"),
+    ("Десерт", "dessert"),
+    ("Выпечка", "bakery"),
+)
+
+
+def png_image(size=(2, 2)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+IMAGE = "data:image/png;base64," + base64.b64encode(png_image()).decode()
+
+
+def scaled(amount):
+    return max(int(amount * SEED_SCALE), 1)
+
+
+def seed_database():
+    """
+    Заполняет тестовую базу реалистичным набором данных.
+
+    Ингредиенты берутся из data/ingredients.json, остальные объекты
+    генерируются детерминированно. Размер набора задаётся переменной
+    окружения FOODGRAM_SEED_SCALE.
+    """
+    rng = random.Random(2024)
+    with open(INGREDIENTS_FILE, encoding="utf-8") as file:
+        Ingredient.objects.bulk_create(
+            Ingredient(**row) for row in json.load(file)
+        )
+    ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+    Tag.objects.bulk_create(Tag(name=name, slug=slug) for name, slug in TAGS)
+    tags = list(Tag.objects.all())
+
+    password = make_password(SEED_PASSWORD)
+    User.objects.bulk_create(
+        User(
+            username=f"user{number}",
+            email=f"user{number}@foodgram.ru",
+            first_name=f"Имя{number}",
+            last_name=f"Фамилия{number}",
+            password=password,
+        )
+        for number in range(scaled(300))
+    )
+    user_ids = list(User.objects.values_list("id", flat=True))
+    authors = user_ids[:scaled(100)]
+
+    Recipe.objects.bulk_create(
+        Recipe(
+            author_id=rng.choice(authors),
+            name=f"Рецепт {number}",
+            image="recipes/seed.png",
+            text="Описание рецепта " * 20,
+            cooking_time=rng.randint(5, 240),
+        )
+        for number in range(scaled(3000))
+    )
+    recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+
+    AmountIngredient.objects.bulk_create(
+        AmountIngredient(
+            recipe_id=recipe_id,
+            ingredients_id=ingredient_id,
+            amount=rng.randint(1, 500),
+        )
+        for recipe_id in recipe_ids
+        for ingredient_id in rng.sample(ingredient_ids, 6)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag.id)
+        for recipe_id in recipe_ids
+        for tag in rng.sample(tags, 2)
+    )
+
+    reader = user_ids[-1]
+    Favorites.objects.bulk_create(
+        Favorites(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rng.sample(recipe_ids, 30)
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rng.sample(recipe_ids, 10)
+    )
+    Subscriptions.objects.bulk_create(
+        Subscriptions(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(authors, 10)
+        if author_id != user_id
+    )
+    for spec in COUNTERS:
+        reconcile(spec)
+    feed.rebuild(user_ids)
+    recommendations.build(settings.RECOMMENDATIONS_TOP_K)
+
+    favorites = set(
+        Favorites.objects.filter(user_id=reader)
+        .values_list("recipe_id", flat=True)
+    )
+    cart = set(
+        ShoppingCart.objects.filter(user_id=reader)
+        .values_list("recipe_id", flat=True)
+    )
+    followed = set(
+        Subscriptions.objects.filter(user_id=reader)
+        .values_list("author_id", flat=True)
+    )
+    return SimpleNamespace(
+        reader=User.objects.get(id=reader),
+        author=User.objects.get(id=authors[0]),
+        stranger=next(
+            author for author in authors
+            if author not in followed and author != reader
+        ),
+        followed=next(iter(followed)),
+        recipe=Recipe.objects.filter(author_id=authors[0]).first().id,
+        favorite=next(iter(favorites)),
+        not_favorite=next(
+            recipe for recipe in recipe_ids if recipe not in favorites
+        ),
+        in_cart=next(iter(cart)),
+        not_in_cart=next(
+            recipe for recipe in recipe_ids if recipe not in cart
+        ),
+        tags=[tag.id for tag in tags],
+        ingredients=ingredient_ids[:3],
+    )
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        return seed_database()
+
+
+@pytest.fixture(scope="session")
+def seed(django_db_setup):
+    return django_db_setup
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    cache.clear()
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def reader_client(db, seed):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=seed.reader)
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+@pytest.fixture
+def author_client(db, seed):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=seed.author)
+    client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
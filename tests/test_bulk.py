@@ -0,0 +1,154 @@
+import pytest
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from api import bulk
+from recipes.models import Favorites, FeedItem, Recipe, ShoppingCart
+from users.models import Subscriptions, User
+
+FAVORITE = reverse("api:recipes-favorite-bulk")
+CART = reverse("api:recipes-shopping-cart-bulk")
+SUBSCRIBE = reverse("api:userprofile-subscribe-bulk")
+
+
+def statuses(response):
+    return {item["id"]: item["status"] for item in response.data["results"]}
+
+
+@pytest.mark.django_db
+def test_favorites_are_added_with_per_item_results(reader_client, seed):
+    before = Recipe.objects.get(pk=seed.not_favorite).favorites_count
+    response = reader_client.post(
+        FAVORITE, {"ids": [seed.not_favorite, seed.favorite, 10 ** 9]}, "json"
+    )
+    assert response.status_code == 200
+    assert statuses(response) == {
+        seed.not_favorite: "created",
+        seed.favorite: "exists",
+        10 ** 9: "not_found",
+    }
+    assert Favorites.objects.filter(
+        user=seed.reader, recipe_id=seed.not_favorite
+    ).exists()
+    assert Recipe.objects.get(pk=seed.not_favorite).favorites_count == (
+        before + 1
+    )
+
+
+@pytest.mark.django_db
+def test_cart_items_are_removed_with_per_item_results(reader_client, seed):
+    before = Recipe.objects.get(pk=seed.in_cart).shopping_cart_count
+    response = reader_client.delete(
+        CART, {"ids": [seed.in_cart, seed.not_in_cart]}, "json"
+    )
+    assert statuses(response) == {
+        seed.in_cart: "deleted",
+        seed.not_in_cart: "missing",
+    }
+    assert not ShoppingCart.objects.filter(
+        user=seed.reader, recipe_id=seed.in_cart
+    ).exists()
+    assert Recipe.objects.get(pk=seed.in_cart).shopping_cart_count == (
+        before - 1
+    )
+
+
+@pytest.mark.django_db
+def test_query_count_does_not_grow_with_batch(reader_client, seed):
+    recipe_ids = list(
+        Recipe.objects.exclude(favorites__user=seed.reader)
+        .values_list("id", flat=True)[:20]
+    )
+    with CaptureQueriesContext(connection) as small:
+        reader_client.post(FAVORITE, {"ids": recipe_ids[:2]}, "json")
+    with CaptureQueriesContext(connection) as large:
+        reader_client.post(FAVORITE, {"ids": recipe_ids[2:]}, "json")
+    assert len(large) == len(small)
+    with CaptureQueriesContext(connection) as removed:
+        reader_client.delete(FAVORITE, {"ids": recipe_ids}, "json")
+    assert len(removed) <= len(small)
+
+
+@pytest.mark.django_db
+def test_subscriptions_update_counters_and_feed(reader_client, seed):
+    before = User.objects.get(pk=seed.stranger).subscribers_count
+    response = reader_client.post(
+        SUBSCRIBE,
+        {"ids": [seed.stranger, seed.followed, seed.reader.id]},
+        "json",
+    )
+    assert statuses(response) == {
+        seed.stranger: "created",
+        seed.followed: "exists",
+        seed.reader.id: "self",
+    }
+    assert User.objects.get(pk=seed.stranger).subscribers_count == (
+        before + 1
+    )
+    assert FeedItem.objects.filter(
+        user=seed.reader, author_id=seed.stranger
+    ).exists()
+
+    reader_client.delete(SUBSCRIBE, {"ids": [seed.stranger]}, "json")
+    assert not Subscriptions.objects.filter(
+        user=seed.reader, author_id=seed.stranger
+    ).exists()
+    assert not FeedItem.objects.filter(
+        user=seed.reader, author_id=seed.stranger
+    ).exists()
+    assert User.objects.get(pk=seed.stranger).subscribers_count == before
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "ids", [[], ["x"], [0], list(range(1, 102))], ids=str
+)
+def test_invalid_id_lists_are_rejected(reader_client, ids):
+    response = reader_client.post(FAVORITE, {"ids": ids}, "json")
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_bulk_requires_authentication(anonymous_client, seed):
+    response = anonymous_client.post(
+        FAVORITE, {"ids": [seed.recipe]}, "json"
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.django_db
+def test_counters_change_only_for_inserted_rows(seed):
+    # Строка уже есть, как если бы её вставили параллельно с проверкой.
+    before = Recipe.objects.get(pk=seed.favorite).favorites_count
+    created = bulk.insert(bulk.FAVORITES, seed.reader, [seed.favorite])
+    assert created == set()
+    assert Recipe.objects.get(pk=seed.favorite).favorites_count == before
+    deleted = bulk.delete(
+        bulk.FAVORITES, seed.reader, [seed.favorite, seed.not_favorite]
+    )
+    assert deleted == {seed.favorite}
+    assert Recipe.objects.get(pk=seed.favorite).favorites_count == (
+        before - 1
+    )
+
+
+@pytest.mark.django_db
+def test_orm_fallback_keeps_counters(reader_client, seed, monkeypatch):
+    monkeypatch.setattr(bulk, "supports_returning", lambda: False)
+    before = Recipe.objects.get(pk=seed.not_favorite).favorites_count
+    response = reader_client.post(
+        FAVORITE, {"ids": [seed.not_favorite, seed.favorite]}, "json"
+    )
+    assert statuses(response) == {
+        seed.not_favorite: "created",
+        seed.favorite: "exists",
+    }
+    assert Recipe.objects.get(pk=seed.not_favorite).favorites_count == (
+        before + 1
+    )
+    response = reader_client.delete(
+        FAVORITE, {"ids": [seed.not_favorite]}, "json"
+    )
+    assert statuses(response) == {seed.not_favorite: "deleted"}
+    assert Recipe.objects.get(pk=seed.not_favorite).favorites_count == before
@@ -0,0 +1,160 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.urls import reverse
+from django.utils.http import http_date
+
+from api import cache as api_cache
+from recipes import snapshots
+from recipes.models import Ingredient, Recipe, Tag
+
+
+@pytest.fixture
+def committed(django_capture_on_commit_callbacks):
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Часы версий и условных ответов, которые тест переводит вручную."""
+    clock = SimpleNamespace(now=time.time())
+    fake = SimpleNamespace(time=lambda: clock.now, monotonic=time.monotonic)
+    monkeypatch.setattr(api_cache, "time", fake)
+    monkeypatch.setattr(snapshots, "time", fake)
+    return clock
+
+
+@pytest.fixture
+def settled(monkeypatch):
+    """Секунда последнего изменения данных уже прошла."""
+    monkeypatch.setattr(
+        api_cache, "time", SimpleNamespace(time=lambda: time.time() + 2)
+    )
+
+
+def detail_url(recipe_id):
+    return reverse("api:recipes-detail", args=[recipe_id])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "url",
+    [
+        lambda seed: reverse("api:recipes-list") + "?limit=5",
+        lambda seed: detail_url(seed.recipe),
+        lambda seed: reverse("api:tags-list"),
+        lambda seed: reverse("api:ingredients-list") + "?name=а",
+    ],
+    ids=["recipes", "recipe", "tags", "ingredients"],
+)
+def test_matching_etag_is_not_modified_without_queries(
+    url, seed, anonymous_client, django_assert_num_queries, settled
+):
+    url = url(seed)
+    response = anonymous_client.get(url)
+    assert response.status_code == 200
+    assert response["Last-Modified"]
+    with django_assert_num_queries(0):
+        response = anonymous_client.get(
+            url, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+    assert response.status_code == 304
+    assert not response.content
+
+
+@pytest.mark.django_db
+def test_if_modified_since_is_honoured(seed, anonymous_client, settled):
+    url = detail_url(seed.recipe)
+    last_modified = anonymous_client.get(url)["Last-Modified"]
+    response = anonymous_client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_recipe_change_changes_etag(seed, anonymous_client, committed):
+    url = detail_url(seed.recipe)
+    etag = anonymous_client.get(url)["ETag"]
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    recipe.name = "Новое название"
+    with committed():
+        recipe.save()
+    response = anonymous_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data["name"] == "Новое название"
+    assert response["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_favorite_changes_etag_only_for_its_user(
+    seed, reader_client, author_client, committed
+):
+    url = detail_url(seed.not_favorite)
+    reader_etag = reader_client.get(url)["ETag"]
+    author_etag = author_client.get(url)["ETag"]
+    assert reader_etag != author_etag
+    with committed():
+        reader_client.post(
+            reverse("api:recipes-favorite", args=[seed.not_favorite])
+        )
+    response = reader_client.get(url, HTTP_IF_NONE_MATCH=reader_etag)
+    assert response.status_code == 200
+    assert response.data["is_favorited"] is True
+    assert "private" in response["Cache-Control"]
+    response = author_client.get(url, HTTP_IF_NONE_MATCH=author_etag)
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_reference_data_is_cached_long(seed, anonymous_client, committed):
+    url = reverse("api:tags-list")
+    response = anonymous_client.get(url)
+    assert "public" in response["Cache-Control"]
+    assert "max-age=86400" in response["Cache-Control"]
+    with committed():
+        Tag.objects.filter(pk=seed.tags[0]).first().save()
+    assert anonymous_client.get(
+        url, HTTP_IF_NONE_MATCH=response["ETag"]
+    ).status_code == 200
+
+    url = reverse("api:ingredients-detail", args=[seed.ingredients[0]])
+    etag = anonymous_client.get(url)["ETag"]
+    with committed():
+        Ingredient.objects.get(pk=seed.ingredients[0]).save()
+    assert anonymous_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+
+@pytest.mark.django_db
+def test_changes_within_one_second_are_not_hidden(
+    seed, anonymous_client, committed, clock
+):
+    url = detail_url(seed.recipe)
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    clock.now = 1000.2
+    with committed():
+        recipe.save()
+    clock.now = 1000.3
+    response = anonymous_client.get(url)
+    assert response.status_code == 200
+    assert "Last-Modified" not in response
+
+    clock.now = 1000.7
+    recipe.name = "Второе изменение"
+    with committed():
+        recipe.save()
+    clock.now = 1000.8
+    response = anonymous_client.get(
+        url, HTTP_IF_MODIFIED_SINCE=http_date(1000)
+    )
+    assert response.status_code == 200
+    assert response.data["name"] == "Второе изменение"
+
+    clock.now = 1002
+    response = anonymous_client.get(url)
+    assert response["Last-Modified"] == http_date(1000)
+    response = anonymous_client.get(
+        url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+    )
+    assert response.status_code == 304
@@ -0,0 +1,101 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from conftest import IMAGE
+from recipes.counters import COUNTERS, reconcile
+from recipes.models import Recipe
+from users.models import User
+
+
+def counter(model, pk, field):
+    return model.objects.values_list(field, flat=True).get(pk=pk)
+
+
+@pytest.mark.django_db
+def test_seed_counters_match_data():
+    assert [reconcile(spec) for spec in COUNTERS] == [0] * len(COUNTERS)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "route, field",
+    [
+        ("api:recipes-favorite", "favorites_count"),
+        ("api:recipes-shopping-cart", "shopping_cart_count"),
+    ],
+)
+def test_recipe_counters_follow_toggles(route, field, seed, reader_client):
+    recipe = Recipe.objects.exclude(favorites__user=seed.reader).exclude(
+        shoppinga_cart__user=seed.reader
+    ).first()
+    before = counter(Recipe, recipe.id, field)
+    url = reverse(route, args=[recipe.id])
+    assert reader_client.post(url).status_code == 201
+    assert counter(Recipe, recipe.id, field) == before + 1
+    assert reader_client.delete(url).status_code == 204
+    assert counter(Recipe, recipe.id, field) == before
+
+
+@pytest.mark.django_db
+def test_subscribers_count_follows_subscribe(seed, reader_client):
+    before = counter(User, seed.stranger, "subscribers_count")
+    url = reverse("api:userprofile-subscribe", args=[seed.stranger])
+    assert reader_client.post(url).status_code == 201
+    assert counter(User, seed.stranger, "subscribers_count") == before + 1
+    assert reader_client.delete(url).status_code == 204
+    assert counter(User, seed.stranger, "subscribers_count") == before
+
+
+@pytest.mark.django_db
+def test_recipes_count_follows_create_and_delete(seed, author_client):
+    author = seed.author.id
+    before = counter(User, author, "recipes_count")
+    response = author_client.post(
+        reverse("api:recipes-list"),
+        {
+            "tags": seed.tags[:1],
+            "ingredients": [{"id": seed.ingredients[0], "amount": 1}],
+            "name": "Счётчик",
+            "image": IMAGE,
+            "text": "Описание",
+            "cooking_time": 5,
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    assert counter(User, author, "recipes_count") == before + 1
+    author_client.delete(
+        reverse("api:recipes-detail", args=[response.data["id"]])
+    )
+    assert counter(User, author, "recipes_count") == before
+
+
+@pytest.mark.django_db
+def test_subscriptions_read_recipes_count_column(seed, reader_client):
+    response = reader_client.get(
+        reverse("api:userprofile-subscriptions") + "?limit=100"
+    )
+    expected = dict(
+        User.objects.filter(subscribers__user=seed.reader).values_list(
+            "id", "recipes_count"
+        )
+    )
+    assert {
+        item["id"]: item["recipes_count"] for item in response.data["results"]
+    } == expected
+
+
+@pytest.mark.django_db
+def test_reconcile_command_repairs_drift(seed):
+    Recipe.objects.filter(pk=seed.recipe).update(favorites_count=999)
+    User.objects.filter(pk=seed.author.id).update(recipes_count=0)
+    call_command("reconcile_counters", stdout=io.StringIO())
+    assert counter(Recipe, seed.recipe, "favorites_count") == (
+        Recipe.objects.get(pk=seed.recipe).favorites.count()
+    )
+    assert counter(User, seed.author.id, "recipes_count") == (
+        Recipe.objects.filter(author=seed.author).count()
+    )
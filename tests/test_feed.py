@@ -0,0 +1,89 @@
+import pytest
+from django.urls import reverse
+
+from api import jobs
+from conftest import IMAGE
+from recipes.models import FeedItem, Recipe
+
+FEED_URL = reverse("api:recipes-feed")
+
+
+def feed_ids(client, url=FEED_URL + "?limit=100"):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+    return ids
+
+
+def followed_recipes(user):
+    return list(
+        Recipe.objects.filter(author__subscribers__user=user).values_list(
+            "id", flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_feed_lists_recipes_of_followed_authors(seed, reader_client):
+    assert feed_ids(reader_client) == followed_recipes(seed.reader)
+
+
+@pytest.mark.django_db
+def test_feed_requires_authentication(anonymous_client):
+    assert anonymous_client.get(FEED_URL).status_code == 401
+
+
+@pytest.mark.django_db
+def test_new_recipe_is_fanned_out_to_subscribers(
+    seed, reader_client, author_client
+):
+    reader_client.post(
+        reverse("api:userprofile-subscribe", args=[seed.author.id])
+    )
+    response = author_client.post(
+        reverse("api:recipes-list"),
+        {
+            "tags": seed.tags[:1],
+            "ingredients": [{"id": seed.ingredients[0], "amount": 1}],
+            "name": "Свежий рецепт",
+            "image": IMAGE,
+            "text": "Описание",
+            "cooking_time": 5,
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    assert not FeedItem.objects.filter(recipe_id=response.data["id"]).exists()
+    while jobs.run_next():
+        pass
+    first = reader_client.get(FEED_URL).data["results"][0]
+    assert first["id"] == response.data["id"]
+    assert first["author"]["is_subscribed"] is True
+    assert FeedItem.objects.filter(recipe_id=response.data["id"]).count() == (
+        seed.author.subscribers.count()
+    )
+
+
+@pytest.mark.django_db
+def test_subscribe_backfills_and_unsubscribe_removes(seed, reader_client):
+    url = reverse("api:userprofile-subscribe", args=[seed.stranger])
+    reader_client.post(url)
+    assert feed_ids(reader_client) == followed_recipes(seed.reader)
+    reader_client.delete(url)
+    assert not set(feed_ids(reader_client)) & set(
+        Recipe.objects.filter(author_id=seed.stranger).values_list(
+            "id", flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_feed_is_capped(seed, reader_client, settings):
+    settings.FEED_MAX_ITEMS = 5
+    reader_client.post(
+        reverse("api:userprofile-subscribe", args=[seed.stranger])
+    )
+    assert feed_ids(reader_client) == followed_recipes(seed.reader)[:5]
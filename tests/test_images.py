@@ -0,0 +1,72 @@
+import pytest
+from django.urls import reverse
+
+from api import jobs
+from api.models import Job
+from conftest import IMAGE
+from recipes.models import Recipe
+
+URL = reverse("api:recipes-list")
+
+
+def recipe_payload(seed, name):
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    return {
+        "tags": list(recipe.tags.values_list("id", flat=True)),
+        "ingredients": [
+            {"id": row.ingredients_id, "amount": row.amount}
+            for row in recipe.recipe_ingredients.all()
+        ],
+        "name": name,
+        "image": IMAGE,
+        "text": "Текст",
+        "cooking_time": 5,
+    }
+
+
+@pytest.mark.django_db
+def test_same_image_is_stored_once(author_client, seed, settings):
+    first = author_client.post(URL, recipe_payload(seed, "Первый"), "json")
+    second = author_client.post(URL, recipe_payload(seed, "Второй"), "json")
+    assert first.status_code == second.status_code == 201
+    assert first.data["image"] == second.data["image"]
+    files = list((settings.MEDIA_ROOT / "recipes").rglob("*.png"))
+    assert len(files) == 1
+
+
+@pytest.mark.django_db
+def test_variants_are_rendered_by_worker(
+    author_client, seed, settings, django_capture_on_commit_callbacks
+):
+    response = author_client.post(URL, recipe_payload(seed, "Новый"), "json")
+    detail = reverse("api:recipes-detail", args=[response.data["id"]])
+    variants = author_client.get(detail).data["image_variants"]
+    assert variants["small"]["webp"] == response.data["image"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        while (job := jobs.run_next()) is not None:
+            assert job.status == Job.DONE
+    variants = author_client.get(detail).data["image_variants"]
+    assert set(variants) == set(settings.IMAGE_VARIANT_SIZES)
+    assert variants["small"]["webp"].endswith(".small.webp")
+    assert variants["medium"]["jpeg"].endswith(".medium.jpg")
+    assert len(list(settings.MEDIA_ROOT.rglob("*.small.*"))) == 2
+
+
+@pytest.mark.django_db
+def test_shared_image_is_ready_without_new_job(
+    author_client, seed, django_capture_on_commit_callbacks
+):
+    first = author_client.post(URL, recipe_payload(seed, "Первый"), "json")
+    with django_capture_on_commit_callbacks(execute=True):
+        while jobs.run_next() is not None:
+            pass
+    assert Recipe.objects.get(pk=first.data["id"]).image_variants_ready
+    second = author_client.post(URL, recipe_payload(seed, "Второй"), "json")
+    assert Recipe.objects.get(pk=second.data["id"]).image_variants_ready
+    assert not Job.objects.filter(
+        kind="image_variants", status=Job.PENDING
+    ).exists()
+    assert second.data["image_variants"]["small"]["webp"].endswith(
+        ".small.webp"
+    )
@@ -0,0 +1,118 @@
+import pytest
+from django.urls import reverse
+
+from api.checks import shared_cache_check
+from conftest import IMAGE
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+URL = reverse("api:ingredients-list")
+
+
+@pytest.mark.django_db
+def test_autocomplete_ranks_prefix_matches_first(anonymous_client, settings):
+    settings.INGREDIENT_AUTOCOMPLETE_LIMIT = 50
+    names = [
+        item["name"] for item in anonymous_client.get(URL, {"name": "мол"}).data
+    ]
+    prefixed = [name for name in names if name.startswith("мол")]
+    assert prefixed
+    assert names[:len(prefixed)] == sorted(prefixed)
+    assert all("мол" in name for name in names[len(prefixed):])
+    assert len(names) > len(prefixed)
+
+
+@pytest.mark.django_db
+def test_autocomplete_is_capped(anonymous_client, settings):
+    settings.INGREDIENT_AUTOCOMPLETE_LIMIT = 5
+    assert len(anonymous_client.get(URL, {"name": "а"}).data) == 5
+
+
+@pytest.mark.django_db
+def test_autocomplete_without_trigrams_matches_prefix(
+    anonymous_client, settings
+):
+    settings.INGREDIENT_TRIGRAM_SEARCH = False
+    names = [
+        item["name"] for item in anonymous_client.get(URL, {"name": "мол"}).data
+    ]
+    assert names
+    assert all(name.startswith("мол") for name in names)
+
+
+@pytest.mark.django_db
+def test_memory_index_follows_ingredient_changes(
+    anonymous_client,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    anonymous_client.get(URL)
+    with django_assert_num_queries(0):
+        assert anonymous_client.get(URL, {"name": "zz"}).data == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredient = Ingredient.objects.create(
+            name="zzz", measurement_unit="г"
+        )
+    assert anonymous_client.get(URL, {"name": "zz"}).data == [
+        {"id": ingredient.id, "name": "zzz", "measurement_unit": "г"}
+    ]
+    detail = reverse("api:ingredients-detail", args=[ingredient.id])
+    assert anonymous_client.get(detail).data["name"] == "zzz"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredient.delete()
+    assert anonymous_client.get(URL, {"name": "zz"}).data == []
+    assert anonymous_client.get(detail).status_code == 404
+
+
+@pytest.mark.django_db
+def test_database_fallback_matches_memory_index(anonymous_client, settings):
+    memory = anonymous_client.get(URL, {"name": "мол"}).data
+    settings.INGREDIENT_MEMORY_INDEX = False
+    assert anonymous_client.get(URL, {"name": "мол"}).data == memory
+
+
+@pytest.mark.django_db
+def test_stale_index_does_not_reject_new_ingredients(author_client, seed):
+    ingredient_index.get()
+    # bulk_create не вызывает сигналов, как и загрузка из другого
+    # процесса с локальным кэшем: снимок о новой строке не знает.
+    Ingredient.objects.bulk_create(
+        [Ingredient(name="зюзюкинская соль", measurement_unit="г")]
+    )
+    ingredient = Ingredient.objects.get(name="зюзюкинская соль")
+    response = author_client.post(
+        reverse("api:recipes-list"),
+        {
+            "tags": seed.tags[:1],
+            "ingredients": [{"id": ingredient.id, "amount": 5}],
+            "name": "С новой солью",
+            "image": IMAGE,
+            "text": "Текст",
+            "cooking_time": 5,
+        },
+        "json",
+    )
+    assert response.status_code == 201
+
+
+@pytest.mark.django_db
+def test_index_is_rebuilt_after_max_age(settings):
+    ingredient_index.get()
+    Ingredient.objects.bulk_create(
+        [Ingredient(name="зюзюкинский перец", measurement_unit="г")]
+    )
+    ingredient = Ingredient.objects.get(name="зюзюкинский перец")
+    assert ingredient_index.get().get(ingredient.id) is None
+    settings.SNAPSHOT_MAX_AGE = 0
+    assert ingredient_index.get().get(ingredient.id) is not None
+
+
+def test_deploy_check_rejects_process_local_cache(settings):
+    settings.CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        }
+    }
+    assert [error.id for error in shared_cache_check(None)] == ["api.E001"]
@@ -0,0 +1,40 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Ingredient, Tag
+
+
+def run(command, *args):
+    out = StringIO()
+    call_command(command, *args, stdout=out)
+    return out.getvalue()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("data_file", ["ingredients.csv", "ingredients.json"])
+def test_load_ingredients_is_idempotent(data_file, settings):
+    path = settings.BASE_DIR.parent / "data" / data_file
+    total = Ingredient.objects.count()
+    assert "добавлено: 0," in run("load_ingredients", str(path))
+
+    Ingredient.objects.filter(
+        id__in=Ingredient.objects.values("id")[:10]
+    ).delete()
+    assert "добавлено: 10," in run("load_ingredients", str(path))
+    assert Ingredient.objects.count() == total
+
+
+@pytest.mark.django_db
+def test_load_tags_skips_duplicates(tmp_path):
+    path = tmp_path / "tags.json"
+    path.write_text(json.dumps([
+        {"name": "Перекус", "slug": "snack"},
+        {"name": "Перекус", "slug": "snack-2"},
+        {"name": "Завтрак", "slug": "breakfast"},
+    ]))
+    output = run("load_tags", str(path))
+    assert "Прочитано строк: 2, добавлено: 1," in output
+    assert Tag.objects.filter(name="Перекус").count() == 1
@@ -0,0 +1,109 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api import pagination
+from api.pagination import estimated_count
+from recipes.models import Recipe
+
+LIST_URL = reverse("api:recipes-list")
+
+
+def walk(client, url):
+    """Проходит все страницы по ссылкам next и собирает id."""
+    ids, pages = [], 0
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert "count" not in response.data
+        ids.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+        pages += 1
+    return ids, pages
+
+
+@pytest.mark.django_db
+def test_cursor_walk_matches_ordering(seed, anonymous_client):
+    ids, pages = walk(anonymous_client, LIST_URL + "?cursor=&limit=100")
+    expected = list(
+        Recipe.objects.order_by("-pub_date", "-id").values_list(
+            "id", flat=True
+        )
+    )
+    assert ids == expected
+    assert pages == -(-len(expected) // 100)
+
+
+@pytest.mark.django_db
+def test_cursor_respects_filters(seed, reader_client):
+    ids, _ = walk(reader_client, LIST_URL + "?cursor=&limit=7&is_favorited=1")
+    assert sorted(ids) == sorted(
+        seed.reader.favorites.values_list("recipe_id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_page_number_pagination_is_default(seed, anonymous_client):
+    response = anonymous_client.get(LIST_URL + "?limit=5&page=2")
+    assert response.status_code == 200
+    assert response.data["count"] == Recipe.objects.count()
+    assert len(response.data["results"]) == 5
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("cursor", ["garbage", "WzFd", "bnVsbA=="])
+def test_invalid_cursor_is_not_found(cursor, seed, anonymous_client):
+    response = anonymous_client.get(f"{LIST_URL}?cursor={cursor}")
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_subscriptions_cursor_walk(seed, reader_client):
+    url = reverse("api:userprofile-subscriptions") + "?cursor=&limit=3"
+    ids, _ = walk(reader_client, url)
+    assert ids == list(
+        seed.reader.subscriptions.order_by("author__email").values_list(
+            "author_id", flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_count_is_cached_per_filter(seed, reader_client):
+    def count_queries(url):
+        with CaptureQueriesContext(connection) as queries:
+            response = reader_client.get(url)
+        counts = [
+            query for query in queries.captured_queries
+            if "COUNT(" in query["sql"].upper()
+        ]
+        return response.data["count"], len(counts)
+
+    favorited = LIST_URL + "?is_favorited=1"
+    assert count_queries(favorited) == (seed.reader.favorites.count(), 1)
+    assert count_queries(favorited + "&page=2") == (
+        seed.reader.favorites.count(), 0
+    )
+    assert count_queries(LIST_URL) == (Recipe.objects.count(), 1)
+
+
+@pytest.mark.django_db
+def test_estimated_count_falls_back_outside_postgres(seed):
+    assert estimated_count(Recipe.objects.all()) is None
+
+
+@pytest.mark.django_db
+def test_low_estimate_does_not_hide_pages(seed, anonymous_client, monkeypatch):
+    monkeypatch.setattr(pagination, "estimated_count", lambda queryset: 1)
+    ids, url = [], LIST_URL + "?limit=2"
+    while url:
+        response = anonymous_client.get(url)
+        assert response.status_code == 200
+        assert response.data["count"] == 1
+        ids.extend(item["id"] for item in response.data["results"])
+        url = response.data["next"]
+    assert sorted(ids) == sorted(Recipe.objects.values_list("id", flat=True))
+    page = len(ids) // 2 + 2
+    response = anonymous_client.get(LIST_URL, {"limit": 2, "page": page})
+    assert response.status_code == 404
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+from django.urls import reverse
+
+from conftest import IMAGE
+from recipes.models import AmountIngredient, Recipe
+from recipes.pantry import pantry_index
+
+COOK_URL = reverse("api:recipes-cook")
+
+
+def recipe_ingredients(recipe_id):
+    return list(
+        AmountIngredient.objects.filter(recipe_id=recipe_id).values_list(
+            "ingredients_id", flat=True
+        )
+    )
+
+
+@pytest.mark.django_db
+def test_full_pantry_ranks_recipe_first(seed, anonymous_client):
+    ingredients = recipe_ingredients(seed.recipe)
+    response = anonymous_client.get(
+        COOK_URL, {"ingredients": ingredients, "limit": 5}
+    )
+    assert response.status_code == 200
+    first = response.data["results"][0]
+    assert first["missing_count"] == 0
+    assert first["coverage"] == 1
+
+
+@pytest.mark.django_db
+def test_results_are_ranked_by_missing_then_coverage(seed, anonymous_client):
+    ingredients = recipe_ingredients(seed.recipe)[:3]
+    results = anonymous_client.get(
+        COOK_URL, {"ingredients": ingredients, "limit": 100}
+    ).data["results"]
+    keys = [(item["missing_count"], -item["coverage"]) for item in results]
+    assert keys == sorted(keys)
+    for item in results[:10]:
+        required = set(recipe_ingredients(item["id"]))
+        assert item["missing_count"] == len(required - set(ingredients))
+
+
+@pytest.mark.django_db
+def test_max_missing_filters_results(seed, anonymous_client):
+    results = anonymous_client.get(
+        COOK_URL,
+        {
+            "ingredients": recipe_ingredients(seed.recipe)[:4],
+            "max_missing": 2,
+            "limit": 100,
+        },
+    ).data["results"]
+    assert results
+    assert all(item["missing_count"] <= 2 for item in results)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("params", [{}, {"ingredients": "x"}])
+def test_invalid_query_is_rejected(params, anonymous_client):
+    assert anonymous_client.get(COOK_URL, params).status_code == 400
+
+
+@pytest.mark.django_db
+def test_index_answers_quickly(seed):
+    index = pantry_index.get()
+    ingredients = recipe_ingredients(seed.recipe) + seed.ingredients
+    started = time.perf_counter()
+    index.match(ingredients, 20)
+    assert time.perf_counter() - started < 0.05
+
+
+@pytest.mark.django_db
+def test_new_recipe_ingredients_are_indexed(
+    seed, author_client, django_capture_on_commit_callbacks
+):
+    pantry_index.get()
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    ingredient = AmountIngredient.objects.filter(recipe=recipe).first()
+    with django_capture_on_commit_callbacks(execute=True):
+        ingredient.delete()
+    results = pantry_index.get().match([ingredient.ingredients_id], 10000)
+    assert recipe.id not in [recipe_id for recipe_id, _, _ in results]
+
+
+@pytest.mark.django_db
+def test_recipe_save_is_applied_without_full_rebuild(
+    seed, author_client, django_capture_on_commit_callbacks
+):
+    index = pantry_index.get()
+    sequence = pantry_index.current_sequence()
+    ingredients = seed.ingredients[:3]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            reverse("api:recipes-list"),
+            {
+                "tags": seed.tags[:1],
+                "ingredients": [
+                    {"id": ingredient_id, "amount": 1}
+                    for ingredient_id in ingredients
+                ],
+                "name": "Из трёх продуктов",
+                "image": IMAGE,
+                "text": "Текст",
+                "cooking_time": 5,
+            },
+            format="json",
+        )
+    assert response.status_code == 201
+    assert pantry_index.current_sequence() == sequence + 1
+    assert pantry_index.get() is index
+    results = index.match(ingredients, 10000)
+    assert (response.data["id"], 0, 1.0) in results
@@ -0,0 +1,348 @@
+"""
+Бюджеты запросов к базе и времени ответа для всех маршрутов API.
+
+Каждый сценарий выполняется на засеянной базе, число SQL-запросов
+и время ответа сравниваются с сохранёнными значениями из
+query_budgets.json. Превышение бюджета означает, что изменение
+добавило лишние запросы (например, N+1) или заметно замедлило ответ.
+"""
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.urls.resolvers import URLResolver
+
+from api.pagination import KeysetPagination
+from conftest import IMAGE, SEED_PASSWORD
+from recipes.models import Recipe
+
+BUDGETS = json.loads(
+    (Path(__file__).parent / "query_budgets.json").read_text()
+)
+TIME_FACTOR = float(os.getenv("FOODGRAM_TIME_BUDGET_FACTOR", "1"))
+
+
+def recipe_payload(seed):
+    return {
+        "tags": seed.tags[:2],
+        "ingredients": [
+            {"id": ingredient, "amount": 10}
+            for ingredient in seed.ingredients
+        ],
+        "name": "Новый рецепт",
+        "image": IMAGE,
+        "text": "Описание",
+        "cooking_time": 15,
+    }
+
+
+def deep_cursor(depth):
+    """Курсор, указывающий на рецепт глубоко в ленте."""
+    ordering = ("-pub_date", "-id")
+    row = Recipe.objects.order_by(*ordering).values_list(
+        "pub_date", "id"
+    )[depth]
+    return KeysetPagination(ordering).encode_cursor(list(row))
+
+
+def current_payload(seed):
+    """Данные рецепта без изменений, кроме названия."""
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    return {
+        "tags": list(recipe.tags.values_list("id", flat=True)),
+        "ingredients": [
+            {"id": row.ingredients_id, "amount": row.amount}
+            for row in recipe.recipe_ingredients.all()
+        ],
+        "name": "Переименованный рецепт",
+        "image": IMAGE,
+        "text": recipe.text,
+        "cooking_time": recipe.cooking_time,
+    }
+
+
+SCENARIOS = {
+    "api-root": ("get", "anonymous", lambda s: reverse("api:api-root"),
+                 None, 200),
+    "tags-list": ("get", "anonymous", lambda s: reverse("api:tags-list"),
+                  None, 200),
+    "tags-detail": ("get", "anonymous",
+                    lambda s: reverse("api:tags-detail", args=[s.tags[0]]),
+                    None, 200),
+    "ingredients-list": ("get", "anonymous",
+                         lambda s: reverse("api:ingredients-list"),
+                         None, 200),
+    "ingredients-list:prefix": (
+        "get", "anonymous",
+        lambda s: reverse("api:ingredients-list") + "?name=мо",
+        None, 200),
+    "ingredients-detail": (
+        "get", "anonymous",
+        lambda s: reverse("api:ingredients-detail", args=[s.ingredients[0]]),
+        None, 200),
+    "recipes-list:anonymous": (
+        "get", "anonymous",
+        lambda s: reverse("api:recipes-list") + "?limit=100",
+        None, 200),
+    "recipes-list:reader": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-list") + "?limit=100",
+        None, 200),
+    "recipes-list:filtered": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-list")
+        + "?limit=100&is_favorited=1&tags=breakfast&tags=lunch",
+        None, 200),
+    "recipes-list:cursor": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-list")
+        + f"?limit=100&cursor={deep_cursor(2500)}",
+        None, 200),
+    "recipes-feed": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-feed") + "?limit=100",
+        None, 200),
+    "recipes-list:search": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-list") + "?limit=100&search=рецепт",
+        None, 200),
+    "recipes-cook": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-cook") + "?" + "&".join(
+            f"ingredients={ingredient}" for ingredient in s.ingredients
+        ),
+        None, 200),
+    "recipes-similar": (
+        "get", "anonymous",
+        lambda s: reverse("api:recipes-similar", args=[s.favorite]),
+        None, 200),
+    "recipes-recommended": (
+        "get", "reader", lambda s: reverse("api:recipes-recommended"),
+        None, 200),
+    "recipes-list:create": (
+        "post", "author", lambda s: reverse("api:recipes-list"),
+        recipe_payload, 201),
+    "recipes-detail": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-detail", args=[s.recipe]),
+        None, 200),
+    "recipes-detail:update": (
+        "patch", "author",
+        lambda s: reverse("api:recipes-detail", args=[s.recipe]),
+        recipe_payload, 200),
+    "recipes-detail:rename": (
+        "patch", "author",
+        lambda s: reverse("api:recipes-detail", args=[s.recipe]),
+        current_payload, 200),
+    "recipes-detail:delete": (
+        "delete", "author",
+        lambda s: reverse("api:recipes-detail", args=[s.recipe]),
+        None, 204),
+    "recipes-favorite:add": (
+        "post", "reader",
+        lambda s: reverse("api:recipes-favorite", args=[s.not_favorite]),
+        None, 201),
+    "recipes-favorite:remove": (
+        "delete", "reader",
+        lambda s: reverse("api:recipes-favorite", args=[s.favorite]),
+        None, 204),
+    "recipes-shopping-cart:add": (
+        "post", "reader",
+        lambda s: reverse("api:recipes-shopping-cart", args=[s.not_in_cart]),
+        None, 201),
+    "recipes-shopping-cart:remove": (
+        "delete", "reader",
+        lambda s: reverse("api:recipes-shopping-cart", args=[s.in_cart]),
+        None, 204),
+    "recipes-favorite-bulk:add": (
+        "post", "reader", lambda s: reverse("api:recipes-favorite-bulk"),
+        lambda s: {"ids": [s.not_favorite, s.favorite]}, 200),
+    "recipes-favorite-bulk:remove": (
+        "delete", "reader", lambda s: reverse("api:recipes-favorite-bulk"),
+        lambda s: {"ids": [s.favorite, s.not_favorite]}, 200),
+    "recipes-shopping-cart-bulk:add": (
+        "post", "reader", lambda s: reverse("api:recipes-shopping-cart-bulk"),
+        lambda s: {"ids": [s.not_in_cart, s.in_cart]}, 200),
+    "recipes-shopping-cart-bulk:remove": (
+        "delete", "reader",
+        lambda s: reverse("api:recipes-shopping-cart-bulk"),
+        lambda s: {"ids": [s.in_cart, s.not_in_cart]}, 200),
+    "recipes-download-shopping-cart": (
+        "get", "reader",
+        lambda s: reverse("api:recipes-download-shopping-cart"),
+        None, 202),
+    "get_recipe_link": (
+        "get", "anonymous",
+        lambda s: reverse("api:get_recipe_link", args=[s.recipe]),
+        None, 200),
+    "userprofile-list": (
+        "get", "anonymous",
+        lambda s: reverse("api:userprofile-list") + "?limit=100",
+        None, 200),
+    "userprofile-list:reader": (
+        "get", "reader",
+        lambda s: reverse("api:userprofile-list") + "?limit=100",
+        None, 200),
+    "userprofile-list:create": (
+        "post", "anonymous", lambda s: reverse("api:userprofile-list"),
+        lambda s: {
+            "email": "new@foodgram.ru",
+            "username": "new_user",
+            "first_name": "Новый",
+            "last_name": "Пользователь",
+            "password": SEED_PASSWORD,
+        }, 201),
+    "userprofile-detail": (
+        "get", "reader",
+        lambda s: reverse("api:userprofile-detail", args=[s.followed]),
+        None, 200),
+    "userprofile-me": ("get", "reader",
+                       lambda s: reverse("api:userprofile-me"), None, 200),
+    "userprofile-subscribe:add": (
+        "post", "reader",
+        lambda s: reverse("api:userprofile-subscribe", args=[s.stranger])
+        + "?recipes_limit=3",
+        None, 201),
+    "userprofile-subscribe:remove": (
+        "delete", "reader",
+        lambda s: reverse("api:userprofile-subscribe", args=[s.followed]),
+        None, 204),
+    "userprofile-subscribe-bulk:add": (
+        "post", "reader", lambda s: reverse("api:userprofile-subscribe-bulk"),
+        lambda s: {"ids": [s.stranger, s.followed]}, 200),
+    "userprofile-subscribe-bulk:remove": (
+        "delete", "reader",
+        lambda s: reverse("api:userprofile-subscribe-bulk"),
+        lambda s: {"ids": [s.followed, s.stranger]}, 200),
+    "userprofile-subscriptions": (
+        "get", "reader",
+        lambda s: reverse("api:userprofile-subscriptions")
+        + "?recipes_limit=3&limit=100",
+        None, 200),
+    "userprofile-subscriptions:cursor": (
+        "get", "reader",
+        lambda s: reverse("api:userprofile-subscriptions")
+        + "?recipes_limit=3&limit=100&cursor=",
+        None, 200),
+    "userprofile-set-password": (
+        "post", "reader", lambda s: reverse("api:userprofile-set-password"),
+        lambda s: {
+            "current_password": SEED_PASSWORD,
+            "new_password": "Another-password-456",
+        }, 204),
+    "userprofile-set-username": (
+        "post", "reader", lambda s: reverse("api:userprofile-set-username"),
+        lambda s: {"current_password": "wrong", "new_username": "x"}, 400),
+    "userprofile-activation": (
+        "post", "anonymous", lambda s: reverse("api:userprofile-activation"),
+        lambda s: {"uid": "bad", "token": "bad"}, 400),
+    "userprofile-resend-activation": (
+        "post", "anonymous",
+        lambda s: reverse("api:userprofile-resend-activation"),
+        lambda s: {"email": s.reader.email}, 400),
+    "userprofile-reset-password": (
+        "post", "anonymous",
+        lambda s: reverse("api:userprofile-reset-password"),
+        lambda s: {"email": "missing@foodgram.ru"}, 204),
+    "userprofile-reset-password-confirm": (
+        "post", "anonymous",
+        lambda s: reverse("api:userprofile-reset-password-confirm"),
+        lambda s: {"uid": "bad", "token": "bad", "new_password": "x"}, 400),
+    "userprofile-reset-username": (
+        "post", "anonymous",
+        lambda s: reverse("api:userprofile-reset-username"),
+        lambda s: {"email": "missing@foodgram.ru"}, 204),
+    "userprofile-reset-username-confirm": (
+        "post", "anonymous",
+        lambda s: reverse("api:userprofile-reset-username-confirm"),
+        lambda s: {"uid": "bad", "token": "bad", "new_username": "x"}, 400),
+    "avatar": ("put", "reader", lambda s: reverse("api:avatar"),
+               lambda s: {"avatar": IMAGE}, 200),
+    "avatar:delete": ("delete", "author", lambda s: reverse("api:avatar"),
+                      None, 404),
+    "login": ("post", "anonymous", lambda s: reverse("api:login"),
+              lambda s: {"email": s.reader.email, "password": SEED_PASSWORD},
+              200),
+    "logout": ("post", "reader", lambda s: reverse("api:logout"), None, 204),
+}
+
+PAGINATED_ROUTES = {
+    "recipes-list": ("reader", lambda: reverse("api:recipes-list")),
+    "recipes-list:cursor": (
+        "reader", lambda: reverse("api:recipes-list") + "?cursor=",
+    ),
+    "userprofile-list": ("reader", lambda: reverse("api:userprofile-list")),
+    "userprofile-subscriptions": (
+        "reader",
+        lambda: reverse("api:userprofile-subscriptions") + "?recipes_limit=3",
+    ),
+    "userprofile-subscriptions:cursor": (
+        "reader",
+        lambda: reverse("api:userprofile-subscriptions")
+        + "?recipes_limit=3&cursor=",
+    ),
+}
+
+
+def api_route_names(patterns):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from api_route_names(pattern.url_patterns)
+        elif pattern.name:
+            yield pattern.name
+
+
+@pytest.fixture
+def clients(anonymous_client, reader_client, author_client):
+    return {
+        "anonymous": anonymous_client,
+        "reader": reader_client,
+        "author": author_client,
+    }
+
+
+def test_every_route_has_a_budget():
+    routes = set(api_route_names(get_resolver("api.urls").url_patterns))
+    covered = {scenario.split(":")[0] for scenario in SCENARIOS}
+    assert routes - covered == set()
+    assert set(SCENARIOS) == set(BUDGETS)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+def test_route_within_budget(scenario, seed, clients):
+    method, client, url, payload, expected_status = SCENARIOS[scenario]
+    budget = BUDGETS[scenario]
+    request = getattr(clients[client], method)
+    data = payload(seed) if payload else None
+    target = url(seed)
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = request(target, data, format="json")
+        elapsed = time.perf_counter() - started
+    assert response.status_code == expected_status, response.content[:500]
+    assert len(queries) <= budget["queries"], "\n".join(
+        query["sql"] for query in queries.captured_queries
+    )
+    assert elapsed <= budget["seconds"] * TIME_FACTOR
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("route", sorted(PAGINATED_ROUTES))
+def test_page_size_does_not_change_query_count(route, clients):
+    client, url = PAGINATED_ROUTES[route]
+    separator = "&" if "?" in url() else "?"
+    counts = []
+    for limit in (1, 50):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = clients[client].get(f"{url()}{separator}limit={limit}")
+        assert response.status_code == 200
+        counts.append(len(queries))
+    assert counts[0] == counts[1]
@@ -0,0 +1,140 @@
+import pytest
+from django.urls import reverse
+
+from recipes.models import AmountIngredient, Ingredient, Recipe, Tag
+
+LIST_URL = reverse("api:recipes-list")
+
+
+@pytest.fixture
+def committed(django_capture_on_commit_callbacks):
+    """Выполняет on_commit-колбэки, как после реального коммита."""
+    return lambda: django_capture_on_commit_callbacks(execute=True)
+
+
+def detail_url(recipe_id):
+    return reverse("api:recipes-detail", args=[recipe_id])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url", ["list", "detail"])
+def test_anonymous_hit_skips_database(
+    url, seed, anonymous_client, django_assert_num_queries
+):
+    url = LIST_URL + "?limit=5" if url == "list" else detail_url(seed.recipe)
+    first = anonymous_client.get(url)
+    with django_assert_num_queries(0):
+        second = anonymous_client.get(url)
+    assert second.status_code == 200
+    assert second.data == first.data
+
+
+@pytest.mark.django_db
+def test_query_string_is_normalised(
+    anonymous_client, django_assert_num_queries
+):
+    anonymous_client.get(LIST_URL + "?tags=lunch&tags=breakfast&limit=5")
+    with django_assert_num_queries(0):
+        anonymous_client.get(LIST_URL + "?limit=5&tags=breakfast&tags=lunch")
+
+
+@pytest.mark.django_db
+def test_authenticated_responses_are_not_cached(
+    reader_client, seed, anonymous_client
+):
+    anonymous_client.get(detail_url(seed.favorite))
+    assert reader_client.get(detail_url(seed.favorite)).data["is_favorited"]
+
+
+@pytest.mark.django_db
+def test_recipe_change_invalidates(seed, anonymous_client, committed):
+    list_url = LIST_URL + "?limit=100"
+    anonymous_client.get(list_url)
+    anonymous_client.get(detail_url(seed.recipe))
+    recipe = Recipe.objects.get(id=seed.recipe)
+    with committed():
+        recipe.name = "Переименованный"
+        recipe.save()
+    assert anonymous_client.get(detail_url(seed.recipe)).data["name"] == (
+        "Переименованный"
+    )
+
+    with committed():
+        new = Recipe.objects.create(
+            author=recipe.author,
+            name="Самый новый",
+            image="recipes/seed.png",
+            text="Описание",
+            cooking_time=10,
+        )
+    assert anonymous_client.get(list_url).data["results"][0]["id"] == new.id
+
+
+@pytest.mark.django_db
+def test_related_changes_invalidate(seed, anonymous_client, committed):
+    url = detail_url(seed.recipe)
+    recipe = Recipe.objects.get(id=seed.recipe)
+    anonymous_client.get(url)
+
+    with committed():
+        recipe.author.first_name = "Новое имя"
+        recipe.author.save()
+    assert anonymous_client.get(url).data["author"]["first_name"] == (
+        "Новое имя"
+    )
+
+    tag = Tag.objects.create(name="Новый тег", slug="new-tag")
+    with committed():
+        recipe.tags.add(tag)
+    assert "new-tag" in [
+        item["slug"] for item in anonymous_client.get(url).data["tags"]
+    ]
+
+    with committed():
+        Tag.objects.filter(id=tag.id).update(name="Тег")
+        tag.name = "Тег"
+        tag.save()
+    assert "Тег" in [
+        item["name"] for item in anonymous_client.get(url).data["tags"]
+    ]
+
+    amount = AmountIngredient.objects.filter(recipe=recipe).first()
+    with committed():
+        amount.amount = 777
+        amount.save()
+    assert 777 in [
+        item["amount"] for item in anonymous_client.get(url).data[
+            "ingredients"
+        ]
+    ]
+
+    ingredient = Ingredient.objects.get(id=amount.ingredients_id)
+    with committed():
+        ingredient.name = "переименованный ингредиент"
+        ingredient.save()
+    assert "переименованный ингредиент" in [
+        item["name"] for item in anonymous_client.get(url).data["ingredients"]
+    ]
+
+
+@pytest.mark.django_db
+def test_reader_gets_cached_documents_with_own_flags(
+    seed, reader_client, anonymous_client, django_assert_num_queries
+):
+    url = LIST_URL + "?limit=100&is_favorited=1"
+    anonymous_client.get(LIST_URL + "?limit=100")
+    reader_client.get(url)
+    # Токен, id страницы и один запрос флагов пользователя:
+    # документы и число записей уже в кэше.
+    with django_assert_num_queries(3):
+        results = reader_client.get(url).data["results"]
+    assert results
+    assert all(item["is_favorited"] for item in results)
+    followed = [
+        item for item in results if item["author"]["id"] == seed.followed
+    ]
+    assert all(item["author"]["is_subscribed"] for item in followed)
+
+    anonymous = anonymous_client.get(detail_url(results[0]["id"])).data
+    assert anonymous["is_favorited"] is False
+    assert anonymous["author"]["is_subscribed"] is False
@@ -0,0 +1,111 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from conftest import IMAGE
+from recipes.models import AmountIngredient, Recipe
+
+
+def payload(recipe, **changes):
+    data = {
+        "tags": list(recipe.tags.values_list("id", flat=True)),
+        "ingredients": [
+            {"id": row.ingredients_id, "amount": row.amount}
+            for row in recipe.recipe_ingredients.all()
+        ],
+        "name": recipe.name,
+        "image": IMAGE,
+        "text": recipe.text,
+        "cooking_time": recipe.cooking_time,
+    }
+    data.update(changes)
+    return data
+
+
+def writes(queries, table):
+    return [
+        query["sql"].split()[0]
+        for query in queries.captured_queries
+        if query["sql"].split()[0] in ("INSERT", "UPDATE", "DELETE")
+        and f'"{table}"' in query["sql"]
+    ]
+
+
+@pytest.fixture
+def recipe(seed):
+    return Recipe.objects.get(pk=seed.recipe)
+
+
+def patch(client, recipe, data):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.patch(
+            reverse("api:recipes-detail", args=[recipe.id]),
+            data,
+            format="json",
+        )
+    assert response.status_code == 200, response.data
+    return response, queries
+
+
+@pytest.mark.django_db
+def test_rename_does_not_touch_ingredients_or_tags(recipe, author_client):
+    response, queries = patch(
+        author_client, recipe, payload(recipe, name="Новое название")
+    )
+    assert response.data["name"] == "Новое название"
+    assert writes(queries, "recipes_amountingredient") == []
+    assert writes(queries, "recipes_recipe_tags") == []
+
+
+@pytest.mark.django_db
+def test_changed_amount_is_a_single_update(recipe, author_client):
+    data = payload(recipe)
+    data["ingredients"][0]["amount"] += 1
+    ids = set(recipe.recipe_ingredients.values_list("id", flat=True))
+    response, queries = patch(author_client, recipe, data)
+    assert writes(queries, "recipes_amountingredient") == ["UPDATE"]
+    assert set(recipe.recipe_ingredients.values_list("id", flat=True)) == ids
+    amounts = {
+        item["id"]: item["amount"] for item in response.data["ingredients"]
+    }
+    assert amounts[data["ingredients"][0]["id"]] == (
+        data["ingredients"][0]["amount"]
+    )
+
+
+@pytest.mark.django_db
+def test_removed_ingredient_and_tag_are_deleted(recipe, author_client):
+    data = payload(recipe)
+    kept = data["ingredients"][1:]
+    data["ingredients"] = kept
+    data["tags"] = data["tags"][:1]
+    response, queries = patch(author_client, recipe, data)
+    assert writes(queries, "recipes_amountingredient") == ["DELETE"]
+    assert writes(queries, "recipes_recipe_tags") == ["DELETE"]
+    assert sorted(
+        AmountIngredient.objects.filter(recipe=recipe).values_list(
+            "ingredients_id", flat=True
+        )
+    ) == sorted(item["id"] for item in kept)
+    assert [tag["id"] for tag in response.data["tags"]] == data["tags"]
+
+
+@pytest.mark.django_db
+def test_update_refreshes_cached_detail(
+    recipe, author_client, anonymous_client,
+    django_capture_on_commit_callbacks,
+):
+    url = reverse("api:recipes-detail", args=[recipe.id])
+    anonymous_client.get(url)
+    data = payload(recipe)
+    data["ingredients"][0]["amount"] += 1
+    with django_capture_on_commit_callbacks(execute=True):
+        patch(author_client, recipe, data)
+    amounts = {
+        item["id"]: item["amount"]
+        for item in anonymous_client.get(url).data["ingredients"]
+    }
+    assert amounts[data["ingredients"][0]["id"]] == (
+        data["ingredients"][0]["amount"]
+    )
@@ -0,0 +1,77 @@
+import io
+
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from recipes.models import Favorites, RecipeSimilarity
+from recipes.recommendations import top_neighbours
+
+
+def test_top_neighbours_uses_cosine_of_co_occurrence():
+    # Пользователи 0 и 1 добавили рецепты 0 и 1, пользователь 2 — 1 и 2.
+    users = np.array([0, 0, 1, 1, 2, 2])
+    items = np.array([0, 1, 0, 1, 1, 2])
+    rows, columns, scores = top_neighbours(users, items, top_k=1)
+    assert rows.tolist() == [0, 1, 2]
+    assert columns.tolist() == [1, 0, 1]
+    assert scores.tolist() == pytest.approx(
+        [2 / np.sqrt(2 * 3), 2 / np.sqrt(3 * 2), 1 / np.sqrt(1 * 3)],
+        rel=1e-6,
+    )
+
+
+def test_top_neighbours_handles_no_favorites():
+    empty = np.array([], dtype=np.int64)
+    rows, columns, scores = top_neighbours(empty, empty, top_k=5)
+    assert len(rows) == len(columns) == len(scores) == 0
+
+
+@pytest.mark.django_db
+def test_similar_recipes_co_occur_in_favorites(seed, anonymous_client):
+    response = anonymous_client.get(
+        reverse("api:recipes-similar", args=[seed.favorite])
+    )
+    assert response.status_code == 200
+    fans = Favorites.objects.filter(recipe_id=seed.favorite).values("user")
+    for item in response.data["results"]:
+        assert Favorites.objects.filter(
+            recipe_id=item["id"], user__in=fans
+        ).exists()
+
+
+@pytest.mark.django_db
+def test_similar_for_missing_recipe_is_not_found(anonymous_client):
+    url = reverse("api:recipes-similar", args=[10 ** 9])
+    assert anonymous_client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_recommended_excludes_own_favorites(seed, reader_client):
+    response = reader_client.get(reverse("api:recipes-recommended"))
+    assert response.status_code == 200
+    ids = [item["id"] for item in response.data["results"]]
+    assert ids
+    assert not set(ids) & set(
+        seed.reader.favorites.values_list("recipe_id", flat=True)
+    )
+
+
+@pytest.mark.django_db
+def test_build_command_replaces_table(seed, settings):
+    call_command("build_recommendations", "--top-k", "3", stdout=io.StringIO())
+    per_recipe = RecipeSimilarity.objects.values_list("recipe", flat=True)
+    assert per_recipe
+    assert max(
+        list(per_recipe).count(recipe) for recipe in set(per_recipe)
+    ) <= 3
+
+
+def test_benchmark_reports_each_size():
+    output = io.StringIO()
+    call_command(
+        "build_recommendations", "--benchmark", "1000,5000", stdout=output
+    )
+    lines = output.getvalue().splitlines()
+    assert [line.split("\t")[0] for line in lines[1:]] == ["1000", "5000"]
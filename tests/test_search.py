@@ -0,0 +1,97 @@
+import pytest
+from django.urls import reverse
+
+from conftest import IMAGE
+from recipes import search as recipe_search
+from recipes.models import Ingredient, Recipe
+
+LIST_URL = reverse("api:recipes-list")
+
+
+def search(client, value):
+    response = client.get(LIST_URL, {"search": value, "limit": 100})
+    assert response.status_code == 200
+    return [item["id"] for item in response.data["results"]]
+
+
+def soup_payload(ingredient, seed):
+    return {
+        "tags": seed.tags[:1],
+        "ingredients": [{"id": ingredient.id, "amount": 1}],
+        "name": "Зюзюкинский суп",
+        "image": IMAGE,
+        "text": "Томить в печи до фырчания",
+        "cooking_time": 30,
+    }
+
+
+@pytest.fixture
+def soup(seed, author_client, django_capture_on_commit_callbacks):
+    ingredient = Ingredient.objects.get(pk=seed.ingredients[0])
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            LIST_URL, soup_payload(ingredient, seed), format="json"
+        )
+    assert response.status_code == 201
+    return response.data["id"], ingredient
+
+
+@pytest.mark.django_db
+def test_search_by_name_text_and_ingredient(soup, anonymous_client):
+    recipe_id, ingredient = soup
+    assert search(anonymous_client, "зюзюкин") == [recipe_id]
+    assert search(anonymous_client, "фырчания печи") == [recipe_id]
+    assert recipe_id in search(anonymous_client, ingredient.name)
+    assert search(anonymous_client, "зюзюкин несуществующее") == []
+
+
+@pytest.mark.django_db
+def test_name_match_ranks_above_text_match(
+    soup, author_client, django_capture_on_commit_callbacks
+):
+    recipe_id, _ = soup
+    other = Recipe.objects.filter(author__isnull=False).exclude(
+        pk=recipe_id
+    ).first()
+    other.text = "Подаётся с зюзюкинским соусом"
+    with django_capture_on_commit_callbacks(execute=True):
+        other.save(update_fields=["text"])
+    assert search(author_client, "зюзюкин") == [recipe_id, other.id]
+
+
+@pytest.mark.django_db
+def test_search_follows_recipe_updates(
+    soup, author_client, django_capture_on_commit_callbacks
+):
+    recipe_id, _ = soup
+    assert search(author_client, "зюзюкин") == [recipe_id]
+    recipe = Recipe.objects.get(pk=recipe_id)
+    recipe.name = "Окрошка"
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.save()
+    assert search(author_client, "окрошка") == [recipe_id]
+    assert search(author_client, "зюзюкин") == []
+
+
+@pytest.mark.django_db
+def test_vector_is_updated_once_per_write(
+    seed, author_client, monkeypatch, django_capture_on_commit_callbacks
+):
+    updates = []
+    monkeypatch.setattr(recipe_search, "uses_database_search", lambda: True)
+    monkeypatch.setattr(recipe_search, "update_search_vectors", updates.append)
+    ingredient = Ingredient.objects.get(pk=seed.ingredients[0])
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.post(
+            LIST_URL, soup_payload(ingredient, seed), format="json"
+        )
+    assert updates == [{response.data["id"]}]
+
+
+@pytest.mark.django_db
+def test_cursor_cannot_be_combined_with_search(anonymous_client):
+    response = anonymous_client.get(
+        LIST_URL, {"search": "суп", "cursor": ""}
+    )
+    assert response.status_code == 400
+    assert "cursor" in response.data
@@ -0,0 +1,141 @@
+import json
+import os
+from datetime import timedelta
+
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+
+from api import jobs
+from api.models import Job
+
+URL = reverse("api:recipes-download-shopping-cart")
+
+
+@pytest.mark.django_db
+def test_pdf_is_rendered_by_worker_and_cached(reader_client):
+    response = reader_client.get(URL)
+    assert response.status_code == 202
+    key = response.data["job"]
+
+    assert jobs.run_next().status == Job.DONE
+    response = reader_client.get(URL)
+    assert response.status_code == 200
+    assert response["Content-Type"] == "application/pdf"
+    assert b"".join(response.streaming_content).startswith(b"%PDF")
+
+    assert jobs.run_next() is None
+    assert Job.objects.filter(key=key).count() == 1
+
+
+@pytest.mark.django_db
+def test_job_is_polled_by_repeating_request(reader_client):
+    key = reader_client.get(URL).data["job"]
+    response = reader_client.get(URL)
+    assert response.status_code == 202
+    assert response.data == {"job": key, "status": Job.PENDING}
+
+    jobs.run_next()
+    assert reader_client.get(URL).status_code == 200
+
+
+@pytest.mark.django_db
+def test_job_of_another_user_is_not_served(reader_client, author_client):
+    key = reader_client.get(URL).data["job"]
+    jobs.run_next()
+    response = author_client.get(URL)
+    assert response.status_code == 202
+    assert response.data["job"] != key
+
+
+@pytest.mark.django_db
+def test_failed_job_is_requeued(reader_client):
+    key = reader_client.get(URL).data["job"]
+    Job.objects.filter(key=key).update(status=Job.FAILED, error="boom")
+    response = reader_client.get(URL)
+    assert response.status_code == 202
+    assert response.data["status"] == Job.PENDING
+    assert jobs.run_next().status == Job.DONE
+
+
+@pytest.mark.django_db
+def test_abandoned_job_is_reclaimed(reader_client, settings):
+    key = reader_client.get(URL).data["job"]
+    assert jobs.claim_next().key == key
+    # Воркер упал, не завершив задачу.
+    assert jobs.claim_next() is None
+    stale = timezone.now() - timedelta(seconds=settings.JOB_LEASE_TIMEOUT + 1)
+    Job.objects.filter(key=key).update(updated=stale)
+    assert reader_client.get(URL).data["status"] == Job.PENDING
+    Job.objects.filter(key=key).update(status=Job.RUNNING, updated=stale)
+    job = jobs.run_next()
+    assert (job.key, job.status) == (key, Job.DONE)
+
+
+@pytest.mark.django_db
+def test_expired_results_are_removed(reader_client, settings):
+    key = reader_client.get(URL).data["job"]
+    job = jobs.run_next()
+    path = job.result.path
+    assert jobs.expire() == 0
+    Job.objects.filter(key=key).update(
+        updated=timezone.now()
+        - timedelta(seconds=settings.JOB_RESULT_TTL + 1)
+    )
+    assert jobs.expire() == 1
+    assert not Job.objects.filter(key=key).exists()
+    assert not os.path.exists(path)
+
+
+@pytest.mark.django_db
+def test_cart_change_creates_new_job(reader_client, seed):
+    first = reader_client.get(URL).data["job"]
+    reader_client.post(
+        reverse("api:recipes-shopping-cart", args=[seed.not_in_cart])
+    )
+    second = reader_client.get(URL).data["job"]
+    assert first != second
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "file_format, content_type",
+    [
+        ("txt", "text/plain; charset=utf-8"),
+        ("csv", "text/csv; charset=utf-8"),
+        ("json", "application/json"),
+    ],
+)
+def test_text_formats_are_streamed(reader_client, file_format, content_type):
+    response = reader_client.get(URL, {"format": file_format})
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == content_type
+    assert Job.objects.count() == 0
+
+
+@pytest.mark.django_db
+def test_formats_share_aggregation(reader_client):
+    rows = json.loads(b"".join(
+        reader_client.get(URL, {"format": "json"}).streaming_content
+    ))
+    lines = b"".join(
+        reader_client.get(URL, {"format": "csv"}).streaming_content
+    ).decode().splitlines()
+    text = b"".join(
+        reader_client.get(URL, {"format": "txt"}).streaming_content
+    ).decode().splitlines()
+    assert rows
+    assert len(lines) == len(rows) + 1
+    assert len(text) == len(rows)
+    first = rows[0]
+    assert lines[1] == ",".join(
+        (first["name"], first["measurement_unit"], str(first["amount"]))
+    )
+
+
+@pytest.mark.django_db
+def test_errors_are_json_for_file_formats(anonymous_client):
+    response = anonymous_client.get(URL)
+    assert response.status_code == 401
+    assert response["Content-Type"] == "application/json"
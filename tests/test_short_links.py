@@ -0,0 +1,180 @@
+import pytest
+from django.urls import reverse
+from django.utils import timezone
+from shortener.models import UrlMap
+
+from conftest import IMAGE
+from recipes.models import Recipe
+from recipes.short_links import (
+    decode,
+    encode,
+    hit_counter,
+    resolve_cached,
+    resolved_codes,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_resolver(monkeypatch):
+    resolved_codes.clear()
+    hit_counter.flush()
+    # Сбрасываем переходы вручную, без фонового потока.
+    monkeypatch.setattr(hit_counter, "start", lambda: None)
+
+
+@pytest.mark.parametrize("recipe_id", [0, 1, 61, 62, 3843, 10 ** 12])
+def test_code_round_trip(recipe_id):
+    assert decode(encode(recipe_id)) == recipe_id
+
+
+@pytest.mark.parametrize("code", ["", "0a", "a-b", "ж"])
+def test_invalid_codes_do_not_decode(code):
+    assert decode(code) is None
+
+
+@pytest.mark.django_db
+def test_get_link_is_derived_from_id(seed, anonymous_client):
+    response = anonymous_client.get(
+        reverse("api:get_recipe_link", args=[seed.recipe])
+    )
+    assert response.data["short-link"].endswith(f"/s/{encode(seed.recipe)}")
+
+
+@pytest.mark.django_db
+def test_short_link_redirects_to_recipe(seed, client):
+    response = client.get(f"/s/{encode(seed.recipe)}/")
+    assert response.status_code == 302
+    assert response["Location"] == f"/recipes/{seed.recipe}/"
+    assert "public" in response["Cache-Control"]
+    assert "max-age=3600" in response["Cache-Control"]
+
+
+@pytest.mark.django_db
+def test_repeated_redirects_skip_database(
+    seed, client, django_assert_num_queries
+):
+    url = f"/s/{encode(seed.recipe)}/"
+    client.get(url)
+    with django_assert_num_queries(0):
+        assert client.get(url).status_code == 302
+
+
+@pytest.mark.django_db
+def test_hits_are_flushed_in_batches(
+    seed, client, settings, django_assert_num_queries
+):
+    settings.SHORT_LINK_FLUSH_INTERVAL = 3600
+    before = Recipe.objects.get(pk=seed.recipe).short_link_hits
+    for _ in range(3):
+        client.get(f"/s/{encode(seed.recipe)}/")
+    client.get(f"/s/{encode(seed.favorite)}/")
+    assert Recipe.objects.get(pk=seed.recipe).short_link_hits == before
+    with django_assert_num_queries(2):
+        hit_counter.flush()
+    assert Recipe.objects.get(pk=seed.recipe).short_link_hits == before + 3
+
+
+@pytest.mark.django_db
+def test_legacy_short_link_still_resolves(seed, client):
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    recipe.short_link = UrlMap.objects.create(
+        user=recipe.author,
+        full_url=f"/recipes/{recipe.id}/",
+        short_url="AbCdE",
+        date_expired=timezone.now(),
+    )
+    recipe.save()
+    response = client.get("/s/AbCdE/")
+    assert response["Location"] == f"/recipes/{recipe.id}/"
+
+
+@pytest.mark.django_db
+def test_misses_are_not_cached(seed):
+    assert resolve_cached("0zz") is None
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    recipe.short_link = UrlMap.objects.create(
+        user=recipe.author,
+        full_url=f"/recipes/{recipe.id}/",
+        short_url="0zz",
+        date_expired=timezone.now(),
+    )
+    recipe.save()
+    assert resolve_cached("0zz") == recipe.id
+
+
+@pytest.mark.django_db
+def test_unknown_code_is_not_found(client):
+    assert client.get("/s/0x/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_code_of_missing_recipe_is_not_found(client):
+    response = client.get(f"/s/{encode(10 ** 9)}/")
+    assert response.status_code == 404
+    assert "public" not in response.get("Cache-Control", "")
+    assert not hit_counter.hits
+
+
+@pytest.mark.django_db
+def test_deleted_recipe_stops_resolving(seed, client):
+    url = f"/s/{encode(seed.recipe)}/"
+    assert client.get(url).status_code == 302
+    Recipe.objects.get(pk=seed.recipe).delete()
+    assert client.get(url).status_code == 404
+
+
+@pytest.mark.django_db
+def test_flush_forgets_recipes_deleted_elsewhere(seed):
+    # Рецепт удалён в другом процессе: сигнал до этого кэша не дошёл.
+    resolved_codes.put(encode(10 ** 9), 10 ** 9)
+    resolved_codes.put(encode(seed.recipe), seed.recipe)
+    hit_counter.hit(10 ** 9)
+    hit_counter.hit(seed.recipe)
+    hit_counter.flush()
+    assert resolved_codes.get(encode(10 ** 9)) is None
+    assert resolved_codes.get(encode(seed.recipe)) == seed.recipe
+
+
+@pytest.mark.django_db
+def test_create_does_not_store_url_map(seed, author_client):
+    before = UrlMap.objects.count()
+    response = author_client.post(
+        reverse("api:recipes-list"),
+        {
+            "tags": seed.tags[:2],
+            "ingredients": [{"id": seed.ingredients[0], "amount": 1}],
+            "name": "Без UrlMap",
+            "image": IMAGE,
+            "text": "Описание",
+            "cooking_time": 5,
+        },
+        format="json",
+    )
+    assert response.status_code == 201
+    assert UrlMap.objects.count() == before
+    assert sorted(tag["id"] for tag in response.data["tags"]) == sorted(
+        seed.tags[:2]
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("field", ["tags", "ingredients"])
+def test_unknown_tags_and_ingredients_are_rejected(
+    field, seed, author_client
+):
+    data = {
+        "tags": seed.tags[:1],
+        "ingredients": [{"id": seed.ingredients[0], "amount": 1}],
+        "name": "Ошибка",
+        "image": IMAGE,
+        "text": "Описание",
+        "cooking_time": 5,
+    }
+    data[field] = (
+        [10 ** 9] if field == "tags" else [{"id": 10 ** 9, "amount": 1}]
+    )
+    response = author_client.post(
+        reverse("api:recipes-list"), data, format="json"
+    )
+    assert response.status_code == 400
+    assert field in response.data
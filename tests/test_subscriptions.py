@@ -0,0 +1,64 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.serializers import recipe_previews
+from recipes.models import Recipe
+
+SUBSCRIPTIONS_URL = reverse("api:userprofile-subscriptions")
+
+
+def latest_recipes(author_id, limit=None):
+    ids = Recipe.objects.filter(author_id=author_id).values_list(
+        "id", flat=True
+    )
+    return list(ids[:limit] if limit else ids)
+
+
+@pytest.mark.django_db
+def test_recipes_limit_is_applied_in_sql(seed, reader_client):
+    with CaptureQueriesContext(connection) as queries:
+        response = reader_client.get(
+            SUBSCRIPTIONS_URL + "?limit=100&recipes_limit=2"
+        )
+    assert response.status_code == 200
+    recipe_queries = [
+        query["sql"] for query in queries.captured_queries
+        if "ROW_NUMBER()" in query["sql"]
+    ]
+    assert len(recipe_queries) == 1
+    for author in response.data["results"]:
+        assert [recipe["id"] for recipe in author["recipes"]] == (
+            latest_recipes(author["id"], 2)
+        )
+
+
+@pytest.mark.django_db
+def test_without_recipes_limit_all_recipes_are_returned(seed, reader_client):
+    response = reader_client.get(SUBSCRIPTIONS_URL + "?limit=3")
+    for author in response.data["results"]:
+        assert [recipe["id"] for recipe in author["recipes"]] == (
+            latest_recipes(author["id"])
+        )
+        assert author["recipes_count"] == len(author["recipes"])
+
+
+@pytest.mark.django_db
+def test_subscribe_response_respects_recipes_limit(seed, reader_client):
+    response = reader_client.post(
+        reverse("api:userprofile-subscribe", args=[seed.stranger])
+        + "?recipes_limit=1"
+    )
+    assert response.status_code == 201
+    assert [recipe["id"] for recipe in response.data["recipes"]] == (
+        latest_recipes(seed.stranger, 1)
+    )
+
+
+@pytest.mark.django_db
+def test_limited_previews_keep_deferred_fields(seed):
+    previews = recipe_previews([seed.followed], limit=2)
+    recipes = previews[seed.followed]
+    assert 0 < len(recipes) <= 2
+    assert "text" in recipes[0].get_deferred_fields()
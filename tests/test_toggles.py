@@ -0,0 +1,45 @@
+import pytest
+from django.urls import reverse
+
+from recipes.models import Favorites, Recipe, ShoppingCart
+
+
+def counter(recipe_id, field):
+    return Recipe.objects.values_list(field, flat=True).get(pk=recipe_id)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "route, model, field",
+    [
+        ("api:recipes-favorite", Favorites, "favorites_count"),
+        ("api:recipes-shopping-cart", ShoppingCart, "shopping_cart_count"),
+    ],
+)
+def test_repeated_toggle_is_idempotent(reader_client, seed, route, model,
+                                       field):
+    recipe = Recipe.objects.exclude(favorites__user=seed.reader).exclude(
+        shoppinga_cart__user=seed.reader
+    ).first()
+    url = reverse(route, args=[recipe.id])
+    before = counter(recipe.id, field)
+
+    response = reader_client.post(url)
+    assert response.status_code == 201
+    assert response.data["id"] == recipe.id
+    assert response.data["name"] == recipe.name
+    assert reader_client.post(url).status_code == 400
+    assert model.objects.filter(user=seed.reader, recipe=recipe).count() == 1
+    assert counter(recipe.id, field) == before + 1
+
+    assert reader_client.delete(url).status_code == 204
+    assert reader_client.delete(url).status_code == 400
+    assert not model.objects.filter(user=seed.reader, recipe=recipe).exists()
+    assert counter(recipe.id, field) == before
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("method", ["post", "delete"])
+def test_missing_recipe_is_not_found(reader_client, method):
+    url = reverse("api:recipes-favorite", args=[10 ** 9])
+    assert getattr(reader_client, method)(url).status_code == 404
@@ -0,0 +1,170 @@
+import base64
+import io
+import json
+import os
+import struct
+import zlib
+
+import pytest
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+
+from api import uploads
+from conftest import png_image
+from recipes.models import Recipe
+from users.models import User
+
+RECIPES = reverse("api:recipes-list")
+AVATAR = reverse("api:avatar")
+
+
+def data_url(content, mime="image/png"):
+    return f"data:{mime};base64," + base64.b64encode(content).decode()
+
+
+def recipe_data(seed, image):
+    recipe = Recipe.objects.get(pk=seed.recipe)
+    return {
+        "tags": list(recipe.tags.values_list("id", flat=True)),
+        "ingredients": [
+            {"id": row.ingredients_id, "amount": row.amount}
+            for row in recipe.recipe_ingredients.all()
+        ],
+        "name": "Загрузка",
+        "image": image,
+        "text": "Текст",
+        "cooking_time": 5,
+    }
+
+
+def bmp_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (2, 2)).save(buffer, "BMP")
+    return buffer.getvalue()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "image",
+    [
+        data_url(png_image((7000, 1))),
+        data_url(bmp_image(), "image/bmp"),
+        data_url(b"not an image at all"),
+        "data:image/png;base64,@@@@",
+    ],
+    ids=["too-wide", "bmp", "not-image", "bad-base64"],
+)
+def test_invalid_base64_images_are_rejected(reader_client, image):
+    response = reader_client.put(AVATAR, {"avatar": image}, "json")
+    assert response.status_code == 400
+    assert "avatar" in response.data
+
+
+@pytest.mark.django_db
+def test_oversized_image_is_rejected_before_decoding(reader_client, settings):
+    settings.IMAGE_UPLOAD_MAX_SIZE = 10
+    response = reader_client.put(
+        AVATAR, {"avatar": data_url(png_image())}, "json"
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_large_body_is_rejected_by_content_length(reader_client, settings):
+    settings.UPLOAD_MAX_BODY_SIZE = 100
+    response = reader_client.put(
+        AVATAR, {"avatar": data_url(png_image((50, 50)))}, "json"
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.django_db
+def test_avatar_can_be_uploaded_as_multipart(reader_client):
+    upload = SimpleUploadedFile("avatar.png", png_image(), "image/png")
+    response = reader_client.put(AVATAR, {"avatar": upload}, "multipart")
+    assert response.status_code == 200
+    assert response.data["avatar"].endswith(".png")
+
+
+@pytest.mark.django_db
+def test_recipe_can_be_created_as_multipart(author_client, seed):
+    data = recipe_data(
+        seed, SimpleUploadedFile("dish.png", png_image(), "image/png")
+    )
+    data["ingredients"] = json.dumps(data["ingredients"])
+    response = author_client.post(RECIPES, data, "multipart")
+    assert response.status_code == 201
+    assert sorted(tag["id"] for tag in response.data["tags"]) == sorted(
+        data["tags"]
+    )
+    assert len(response.data["ingredients"]) == len(
+        json.loads(data["ingredients"])
+    )
+
+
+@pytest.mark.django_db
+def test_recipe_with_base64_image_is_created(author_client, seed):
+    response = author_client.post(
+        RECIPES, recipe_data(seed, data_url(png_image((30, 20)))), "json"
+    )
+    assert response.status_code == 201
+    assert response.data["image"].endswith(".png")
+
+
+@pytest.mark.django_db
+def test_deleting_avatar_keeps_shared_file(reader_client, author_client):
+    image = data_url(png_image((40, 40)))
+    reader_client.put(AVATAR, {"avatar": image}, "json")
+    url = author_client.put(AVATAR, {"avatar": image}, "json").data["avatar"]
+    assert reader_client.delete(AVATAR).status_code == 204
+    storage = User._meta.get_field("avatar").storage
+    assert storage.exists(url.split(settings.MEDIA_URL, 1)[1])
+
+
+@pytest.mark.django_db
+def test_base64_with_line_breaks_is_decoded(reader_client, monkeypatch):
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 100)
+    content = base64.encodebytes(png_image((60, 60))).decode()
+    assert "\n" in content[:100]
+    response = reader_client.put(
+        AVATAR, {"avatar": "data:image/png;base64," + content}, "json"
+    )
+    assert response.status_code == 200
+
+
+def png_with_header_size(width, height):
+    """PNG 2×2, в заголовке IHDR которого записан другой размер."""
+    content = bytearray(png_image())
+    ihdr = content[12:29]
+    ihdr[4:12] = struct.pack(">II", width, height)
+    content[12:29] = ihdr
+    content[29:33] = struct.pack(">I", zlib.crc32(bytes(ihdr)))
+    return bytes(content)
+
+
+@pytest.mark.django_db
+def test_decompression_bomb_header_is_rejected(reader_client):
+    response = reader_client.put(
+        AVATAR,
+        {"avatar": data_url(png_with_header_size(20000, 20000))},
+        "json",
+    )
+    assert response.status_code == 400
+    assert "avatar" in response.data
+
+
+@pytest.mark.django_db
+def test_size_limit_ignores_line_breaks(reader_client, settings):
+    buffer = io.BytesIO()
+    Image.frombytes("RGB", (40, 40), os.urandom(40 * 40 * 3)).save(
+        buffer, "PNG"
+    )
+    content = buffer.getvalue()
+    settings.IMAGE_UPLOAD_MAX_SIZE = len(content)
+    wrapped = base64.encodebytes(content).decode()
+    response = reader_client.put(
+        AVATAR, {"avatar": "data:image/png;base64," + wrapped}, "json"
+    )
+    assert response.status_code == 200